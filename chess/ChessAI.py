@@ -4,10 +4,16 @@ Handling the AI moves.
 import random
 import multiprocessing
 from multiprocessing import Pool, cpu_count, Queue
-import copy
+import threading
 import time
 import logging
 import os
+from ChessTransposition import TranspositionTable, SharedTranspositionTable, PawnHashTable, EXACT, LOWER, UPPER
+from ChessEngine import (
+    Move, EMPTY, WHITE, BLACK, PAWN, KING, PIECE_NAMES, BOARD_SQUARES, KING_OFFSETS, SQUARE_ROWS, SQUARE_COLS,
+    TYPE_MASK, SQUARE_MASK, PIECE_FIELD_MASK, MOVE_END_SHIFT, MOVE_PIECE_SHIFT, MOVE_CAPTURED_SHIFT, MOVE_PROMOTION,
+    MOVE_ENPASSANT, TACTICAL_MOVE_FLAGS, EXCHANGE_VALUES, MAX_PHASE, squareIndex, setEvaluationTables,
+)
 
 # Set up logging
 log_dir = os.path.dirname(os.path.abspath(__file__))
@@ -39,7 +45,18 @@ ai_stats = {
     "best_move_scores": {},
     "parallel_efficiency": 0,
     "nodes_for_current_move": 0,  # Nodes evaluated for the current move
-    "nodes_pruned_for_current_move": 0  # Nodes pruned for the current move
+    "nodes_pruned_for_current_move": 0,  # Nodes pruned for the current move
+    "tt_probes": 0,  # Transposition table lookups
+    "tt_hits": 0,  # Lookups that found the position
+    "tt_collisions": 0,  # Lookups that found the bucket holding other positions
+    "tt_stores": 0,
+    "pawn_probes": 0,  # Pawn hash table lookups
+    "pawn_hits": 0,  # Lookups that found the pawn structure's score
+    "first_move_cutoffs": 0,  # Cutoffs made by the first move searched, a measure of the move ordering
+    "null_move_tries": 0,  # Null-move searches
+    "null_move_cutoffs": 0,  # Null-move searches that failed high and cut the node off
+    "lmr_reductions": 0,  # Late moves searched at reduced depth
+    "lmr_researches": 0  # Reduced moves that beat alpha and were searched again at full depth
 }
 
 # Reset stats for new move calculation
@@ -55,7 +72,18 @@ def reset_stats():
         "best_move_scores": {},
         "parallel_efficiency": 0,
         "nodes_for_current_move": 0,
-        "nodes_pruned_for_current_move": 0
+        "nodes_pruned_for_current_move": 0,
+        "tt_probes": 0,
+        "tt_hits": 0,
+        "tt_collisions": 0,
+        "tt_stores": 0,
+        "pawn_probes": 0,
+        "pawn_hits": 0,
+        "first_move_cutoffs": 0,
+        "null_move_tries": 0,
+        "null_move_cutoffs": 0,
+        "lmr_reductions": 0,
+        "lmr_researches": 0
     }
 
 # Enhanced piece values - more nuanced than before
@@ -117,16 +145,262 @@ piecePositionScore = {"wN": knightScore,
                          "wp": pawnScore,
                          "bp": pawnScore[::-1]}
 
+# The same tables keyed by the engine's integer piece codes and indexed by mailbox square
+pieceValueByCode = {code: pieceScore[name[1]] for code, name in PIECE_NAMES.items() if code != EMPTY}
+piecePositionScoreByCode = {code: [0] * 120 for code in pieceValueByCode}
+for _code, _name in PIECE_NAMES.items():
+    if _name in piecePositionScore:
+        for _square in BOARD_SQUARES:
+            _row, _col = SQUARE_ROWS[_square], SQUARE_COLS[_square]
+            piecePositionScoreByCode[_code][_square] = piecePositionScore[_name][_row][_col]
+
+# Piece positioning counts for more in the endgame
+ENDGAME_POSITION_WEIGHT = 1.5
+# Weights of the other evaluation terms, in pawns
+MOBILITY_WEIGHT = 0.1  # per pseudo-legal move
+DOUBLED_PAWN_PENALTY = 0.5  # per extra pawn on a file
+ISOLATED_PAWN_PENALTY = 0.3  # per file of pawns with no friendly pawns on the files next to it
+KING_DEFENDER_BONUS = 0.2  # per friendly piece next to the king, in the middlegame
+KING_CENTER_DISTANCE_PENALTY = 0.05  # per step of the king from the centre, in the endgame
+CENTER_OCCUPATION_BONUS = 0.2  # per piece on d4, e4, d5 or e5
+
+# Material plus position for each piece code and square, in the middlegame and in the endgame, negated for black.
+# The game state keeps their sums and the game phase up to date as moves are made, and scorePosition blends
+# the two sums by phase
+_sign = {code: 1 if code & WHITE else -1 for code in pieceValueByCode}
+setEvaluationTables(
+    {code: [_sign[code] * (pieceValueByCode[code] + bonus) for bonus in bonuses]
+     for code, bonuses in piecePositionScoreByCode.items()},
+    {code: [_sign[code] * (pieceValueByCode[code] + ENDGAME_POSITION_WEIGHT * bonus) for bonus in bonuses]
+     for code, bonuses in piecePositionScoreByCode.items()},
+)
+
 CHECKMATE = 1000
 STALEMATE = 0
-DEPTH = 5
+DRAW = 0
+DEPTH = 8  # deepest iteration of the iterative deepening search
+# Seconds allowed for a move; the search returns the best move of the last iteration that finished in time
+TIME_LIMIT = 5.0
+# Memory for each process's transposition table
+TT_SIZE_MB = 16
+# Slots in each process's pawn hash table
+PAWN_TABLE_ENTRIES = 1 << 14
+# Search the hash move, then captures by MVV-LVA, killer moves and quiet moves by history score; turn off to
+# compare node counts with generator order
+MOVE_ORDERING = True
+MAX_PLY = 64
+# Null-move pruning: at this depth or more, out of check and with a piece besides king and pawns (a side with
+# only pawns may be in zugzwang, where passing would be its best move), let the opponent move twice; if a search
+# NULL_MOVE_REDUCTION plies shallower still fails high, the node is cut off without searching its moves
+NULL_MOVE_PRUNING = True
+NULL_MOVE_REDUCTION = 2
+NULL_MOVE_MIN_DEPTH = 3
+# Late-move reductions: at this depth or more, quiet moves after the first LMR_FULL_DEPTH_MOVES that don't give
+# check, made out of check, are searched LMR_REDUCTION plies shallower with a null window first, and again at
+# full depth only if they beat alpha
+LATE_MOVE_REDUCTIONS = True
+LMR_MIN_DEPTH = 3
+LMR_FULL_DEPTH_MOVES = 3
+LMR_REDUCTION = 1
+# Width of the null windows those searches use; scores closer than this are treated as equal
+SCOUT_WINDOW = 0.01
+PRUNING_STATS = ("null_move_tries", "null_move_cutoffs", "lmr_reductions", "lmr_researches")
+# Quiescence search: skip a capture that can't bring the score near alpha even with this much positional gain
+# on top of the captured piece, and captures that lose material by static exchange
+DELTA_MARGIN = 2
 # Number of worker processes to use (adjust based on CPU cores)
 NUM_WORKERS = max(1, cpu_count() - 1)
+# How the workers share a search: "lazy_smp" has every worker search all the root moves, at staggered depths,
+# through one transposition table; "root_split" gives each worker a fixed share of the root moves
+PARALLEL_SEARCH = "lazy_smp"
+# Memory for the transposition table the pool's workers share
+SHARED_TT_SIZE_MB = 64
+
+
+# Each process searches with its own table; worker processes start from a copy of the parent's
+transpositionTable = TranspositionTable(TT_SIZE_MB)
+pawnTable = PawnHashTable(PAWN_TABLE_ENTRIES)
+
+# Depth and deadline of the iteration in progress, set before each call into the negamax search
+searchDepth = DEPTH
+searchDeadline = None
+
+
+# In a pool worker: the flag the main process raises to abandon a search, and the position last searched as
+# [snapshot, game state], so the iterations of one move restore it only once
+stopFlag = None
+workerPosition = [None, None]
+
+
+class SearchTimeout(Exception):
+    """
+    Raised inside the negamax search when the deadline passes, abandoning the current iteration.
+    """
+
+
+# Ordering keys, highest searched first: the hash move, captures and promotions (most valuable victim, then least
+# valuable attacker), the two killer moves of the ply, then quiet moves by history score, which stays below
+# KILLER_ORDER
+HASH_ORDER = 1 << 30
+CAPTURE_ORDER = 1 << 29
+KILLER_ORDER = 1 << 28
+# Victim values by piece code, the static exchange values with the king (never captured) left out
+VICTIM_ORDER = [0 if code & TYPE_MASK == KING else EXCHANGE_VALUES[code & TYPE_MASK] for code in range(32)]
+PROMOTION_ORDER = max(VICTIM_ORDER)  # a promotion counts as winning a queen
+
+# Quiet moves that caused a cutoff: the last two per ply from the root, and a score per piece and target square
+killerMoves = [[0, 0] for _ in range(MAX_PLY)]
+historyScores = [[0] * 120 for _ in range((BLACK | KING) + 1)]
+orderingKey = None  # the root position the tables were last carried over to
+
 
+def ageOrdering(key):
+    """
+    Carry the killer moves and history scores over to a search from a new root position (its Zobrist key).
+    Two plies are played between the engine's moves, so the killers move two plies closer to the root, and the
+    history scores are halved so the new search's cutoffs soon outweigh the old ones. Another search from the
+    same root, as when one worker gets two tasks of a move, keeps the tables as they are.
+    """
+    global orderingKey
+    if key == orderingKey:
+        return
+    orderingKey = key
+    killerMoves[:] = killerMoves[2:] + [[0, 0], [0, 0]]
+    for scores in historyScores:
+        scores[:] = [score >> 1 for score in scores]
 
-def findBestMove(gs, validMoves, return_queue):
+
+def orderMoves(moves, ply, hash_code):
+    """
+    The moves as a list sorted into search order, keeping the given order among equals.
+    """
+    killers = killerMoves[ply] if ply < MAX_PLY else (0, 0)
+
+    def orderKey(move):
+        code = move.code
+        if code == hash_code:
+            return HASH_ORDER
+        piece = code >> MOVE_PIECE_SHIFT & PIECE_FIELD_MASK
+        if code & TACTICAL_MOVE_FLAGS:
+            victim = PROMOTION_ORDER if code & MOVE_PROMOTION else VICTIM_ORDER[code >> MOVE_CAPTURED_SHIFT & PIECE_FIELD_MASK]
+            return CAPTURE_ORDER + victim * 8 - (piece & TYPE_MASK)
+        if code == killers[0] or code == killers[1]:
+            return KILLER_ORDER + (code == killers[0])
+        return min(historyScores[piece][code >> MOVE_END_SHIFT & SQUARE_MASK], KILLER_ORDER - 1)
+
+    return sorted(moves, key=orderKey, reverse=True)
+
+
+def orderStages(gs, stages, ply, hash_code):
+    """
+    Yield the moves of a node in search order one stage at a time, so a cutoff leaves the later stages of
+    gs.iterMoveStages ungenerated: the hash move before anything is generated, then the captures and promotions
+    by MVV-LVA, then the quiet moves, killers first and the rest by history.
+    """
+    if hash_code:
+        if hashMoveFits(gs, hash_code):
+            yield Move.fromCode(hash_code)
+        else:
+            hash_code = 0
+    for moves in stages:
+        for move in orderMoves(moves, ply, 0):
+            if move.code != hash_code:
+                yield move
+
+
+def hashMoveFits(gs, code):
+    """
+    Whether the stored move is one of the side to move's pieces going where the move says, to search it before
+    generating the moves. The entry was stored for this Zobrist key, so this only guards against a collision.
+    """
+    piece = code >> MOVE_PIECE_SHIFT & PIECE_FIELD_MASK
+    squares = gs.squares
+    return (
+        piece & (WHITE if gs.whiteToMove else BLACK) != 0
+        and squares[code & SQUARE_MASK] == piece
+        and squares[code >> MOVE_END_SHIFT & SQUARE_MASK] == (
+            EMPTY if code & MOVE_ENPASSANT else code >> MOVE_CAPTURED_SHIFT & PIECE_FIELD_MASK)
+    )
+
+
+def recordCutoff(move, ply, depth):
+    """
+    Remember a quiet move that caused a cutoff as a killer for its ply and in the history table.
+    """
+    code = move.code
+    if code & TACTICAL_MOVE_FLAGS:
+        return
+    if ply < MAX_PLY:
+        killers = killerMoves[ply]
+        if killers[0] != code:
+            killers[1] = killers[0]
+            killers[0] = code
+    historyScores[code >> MOVE_PIECE_SHIFT & PIECE_FIELD_MASK][code >> MOVE_END_SHIFT & SQUARE_MASK] += depth * depth
+
+
+def initWorker(stop_flag, tt_name=None):
+    """
+    Pool initializer: keep the flag that abandons a search and attach to the shared transposition table.
+    """
+    global stopFlag, transpositionTable
+    stopFlag = stop_flag
+    if tt_name is not None:
+        transpositionTable = SharedTranspositionTable(SHARED_TT_SIZE_MB, tt_name)
+
+
+def newWorkerPool(workers, stop_flag, shared_table):
+    return Pool(processes=workers, initializer=initWorker, initargs=(stop_flag, shared_table.name))
+
+
+class EnginePool:
+    """
+    Search worker processes started once and kept for the whole game. Each move pays no process start-up or
+    module imports, and the workers keep their transposition and ordering tables from move to move.
+    A search runs on a background thread of the calling process; is_alive() and terminate() stand in for the
+    per-move Process ChessMain used to start.
+    """
+    def __init__(self, workers=NUM_WORKERS):
+        self.workers = workers
+        self.stop_flag = multiprocessing.RawValue("b", 0)
+        self.shared_table = SharedTranspositionTable(SHARED_TT_SIZE_MB)
+        self.pool = newWorkerPool(workers, self.stop_flag, self.shared_table)
+        self.thread = None
+
+    def start(self, gs, validMoves, return_queue):
+        """
+        Search a copy of the position in the background; the best move and the stats go on return_queue.
+        """
+        self.terminate()
+        search_gs = type(gs)()
+        search_gs.restore(gs.snapshot())
+        self.stop_flag.value = 0
+        self.thread = threading.Thread(
+            target=findBestMove, args=(search_gs, list(validMoves), return_queue, self), daemon=True
+        )
+        self.thread.start()
+
+    def is_alive(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def terminate(self):
+        """
+        Abandon the search in progress, if any, and wait for the workers to let go of it.
+        """
+        if self.is_alive():
+            self.stop_flag.value = 1
+            self.thread.join()
+
+    def close(self):
+        self.terminate()
+        self.pool.terminate()
+        self.pool.join()
+        self.shared_table.unlink()
+
+
+def findBestMove(gs, validMoves, return_queue, engine=None):
     """
     Use multiprocessing to find the best move using parallel alpha-beta search
+    Runs on the workers of engine, an EnginePool, or on a pool started for this move if none is given
     """
     global ai_stats
     start_time = time.time()
@@ -141,13 +415,16 @@ def findBestMove(gs, validMoves, return_queue):
         return_queue.put((None, ai_stats))
         return
     
-    random.shuffle(validMoves)
+    random.shuffle(validMoves)  # varies the choice between equal moves; the ordering below keeps ties shuffled
+    if MOVE_ORDERING:
+        validMoves[:] = orderMoves(validMoves, 0, 0)
     ai_stats["moves_considered"] = len(validMoves)
+    deadline = start_time + TIME_LIMIT
     
-    # For very small number of moves, use sequential search
-    if len(validMoves) <= 2:
+    # For very small number of moves, use sequential search rather than start a pool
+    if len(validMoves) <= 2 and engine is None:
         logger.info("Using sequential search due to small number of moves")
-        best_move = findBestMoveSequential(gs, validMoves)
+        best_move = findBestMoveSequential(gs, validMoves, deadline)
         end_time = time.time()
         ai_stats["time_spent"] = end_time - start_time
         log_move_stats(best_move)
@@ -159,48 +436,18 @@ def findBestMove(gs, validMoves, return_queue):
     seq_positions = estimate_sequential_positions(gs, validMoves)
     seq_time_estimate = (time.time() - seq_start_time) * seq_positions / 100  # Estimate based on sample
     
-    # Split moves among workers
-    with Pool(processes=NUM_WORKERS) as pool:
-        # Create a list of tuples with game state and moves for each worker
-        move_chunks = []
-        chunk_size = max(1, len(validMoves) // NUM_WORKERS)
-        
-        logger.info(f"Dividing {len(validMoves)} moves into {NUM_WORKERS} chunks of approximately {chunk_size} moves each")
-        
-        for i in range(0, len(validMoves), chunk_size):
-            # Make a deep copy of the game state for each worker
-            gs_copy = copy.deepcopy(gs)
-            # Get a chunk of moves for this worker
-            move_subset = validMoves[i:i+chunk_size]
-            move_chunks.append((gs_copy, move_subset))
-        
-        # Map the evaluation function to each chunk of moves
-        results = pool.map(evaluateMoveSet, move_chunks)
-    
-    # Combine statistics from workers
-    positions_evaluated = 0
-    cutoffs = 0
-    for result in results:
-        if len(result) > 2:  # Contains stats
-            worker_stats = result[2]
-            positions_evaluated += worker_stats.get("positions_evaluated", 0)
-            cutoffs += worker_stats.get("alpha_beta_cutoffs", 0)
-    
-    ai_stats["positions_evaluated"] = positions_evaluated
-    ai_stats["alpha_beta_cutoffs"] = cutoffs
-    
-    # Find the best move from all results
-    best_score = -CHECKMATE
-    best_move = None
-    
-    for result in results:
-        move = result[0]
-        score = result[1]
-        logger.info(f"Worker evaluated move {move} with score {score}")
-        
-        if move and score > best_score:
-            best_score = score
-            best_move = move
+    # Search on the workers until the deadline
+    search = searchLazySmp if PARALLEL_SEARCH == "lazy_smp" else searchRootMoves
+    if engine is None:
+        stop_flag = multiprocessing.RawValue("b", 0)
+        shared_table = SharedTranspositionTable(SHARED_TT_SIZE_MB)
+        try:
+            with newWorkerPool(NUM_WORKERS, stop_flag, shared_table) as pool:
+                best_move = search(pool, NUM_WORKERS, gs, validMoves, deadline)
+        finally:
+            shared_table.unlink()
+    else:
+        best_move = search(engine.pool, engine.workers, gs, validMoves, deadline)
     
     end_time = time.time()
     ai_stats["time_spent"] = end_time - start_time
@@ -215,15 +462,135 @@ def findBestMove(gs, validMoves, return_queue):
     return_queue.put((best_move, ai_stats))
 
 
+def searchLazySmp(pool, workers, gs, validMoves, deadline):
+    """
+    Lazy SMP: every worker runs its own iterative deepening over all the root moves until the deadline, sharing
+    what it finds through the transposition table. Every other worker starts one ply deeper and the helpers
+    shuffle the root moves, so they don't all search the same tree in step. Returns the best move of the
+    deepest finished iteration (the first worker's on a tie) and adds the workers' counts to ai_stats.
+    """
+    snapshot = gs.snapshot()
+    tasks = [(type(gs), snapshot, validMoves, deadline, helper) for helper in range(workers)]
+    logger.info(f"Lazy SMP search of {len(validMoves)} moves on {workers} workers")
+    results = pool.map(lazySmpWorker, tasks, chunksize=1)
+    
+    best_move = validMoves[0]
+    best_depth = 0
+    for helper, (move, depth, worker_stats) in enumerate(results):
+        logger.info(f"Worker {helper} chose {move} at depth {depth}")
+        if move is not None and depth > best_depth:
+            best_move = move
+            best_depth = depth
+        for name in ("positions_evaluated", "alpha_beta_cutoffs", "first_move_cutoffs", "tt_probes", "tt_hits",
+                     "tt_collisions", "tt_stores", "pawn_probes", "pawn_hits") + PRUNING_STATS:
+            ai_stats[name] += worker_stats[name]
+    ai_stats["max_depth_reached"] = best_depth
+    return best_move
+
+
+def lazySmpWorker(args):
+    """
+    One worker's share of a Lazy SMP search: iterative deepening over all the root moves.
+    Returns its best move, the depth of its last finished iteration and its stats.
+    """
+    game_class, snapshot, moves, deadline, helper = args
+    gs = workerGameState(game_class, snapshot)
+    moves = list(moves)
+    if helper:
+        random.shuffle(moves)
+    reset_stats()
+    best_move = findBestMoveSequential(gs, moves, deadline, first_depth=1 + helper % 2)
+    return best_move, ai_stats["max_depth_reached"], ai_stats
+
+
+def workerGameState(game_class, snapshot):
+    """
+    The worker's game state set up at the snapshot's position, restored only when the position changes.
+    """
+    gs = workerPosition[1]
+    if workerPosition[0] != snapshot or type(gs) is not game_class:
+        if type(gs) is not game_class:
+            gs = game_class()
+        gs.restore(snapshot)
+        workerPosition[:] = [snapshot, gs]
+    return gs
+
+
+def searchRootMoves(pool, workers, gs, validMoves, deadline):
+    """
+    Iterative deepening over the root moves shared out in chunks to the pool's workers, one pool.map per
+    iteration. Returns the best move of the last iteration every chunk finished and adds the workers' counts
+    to ai_stats.
+    """
+    best_move = validMoves[0]
+    positions_evaluated = 0
+    cutoffs = 0
+    chunk_size = max(1, len(validMoves) // workers)
+    # Workers get the position as its snapshot and keep it between iterations
+    game_class = type(gs)
+    snapshot = gs.snapshot()
+    
+    logger.info(f"Dividing {len(validMoves)} moves into {workers} chunks of approximately {chunk_size} moves each")
+    
+    for depth in range(1, DEPTH + 1):
+        # Create a list of tuples with the position and moves for each worker; the first iteration always
+        # finishes so there is a move to play
+        move_chunks = []
+        for i in range(0, len(validMoves), chunk_size):
+            move_subset = validMoves[i:i+chunk_size]
+            move_chunks.append((game_class, snapshot, move_subset, depth, deadline if depth > 1 else None))
+        
+        # Map the evaluation function to each chunk of moves
+        results = pool.map(evaluateMoveSet, move_chunks)
+        
+        # Combine statistics from workers
+        for result in results:
+            worker_stats = result[2]
+            positions_evaluated += worker_stats.get("positions_evaluated", 0)
+            cutoffs += worker_stats.get("alpha_beta_cutoffs", 0)
+            ai_stats["first_move_cutoffs"] += worker_stats.get("first_move_cutoffs", 0)
+            for name in PRUNING_STATS:
+                ai_stats[name] += worker_stats.get(name, 0)
+            for name, count in worker_stats.get("tables", {}).items():
+                ai_stats[name] += count
+        
+        if any(result[0] is None for result in results):
+            logger.info(f"Depth {depth} stopped at the deadline")
+            break
+        
+        # Find the best move from all results
+        best_score = -CHECKMATE
+        best_move = None
+        for result in results:
+            move = result[0]
+            score = result[1]
+            logger.info(f"Depth {depth}: worker evaluated move {move} with score {score}")
+            
+            if best_move is None or score > best_score:
+                best_score = score
+                best_move = move
+        
+        ai_stats["max_depth_reached"] = depth
+        # The next iteration starts with this one's best move
+        validMoves.remove(best_move)
+        validMoves.insert(0, best_move)
+        if abs(best_score) >= CHECKMATE:
+            break
+    
+    ai_stats["positions_evaluated"] = positions_evaluated
+    ai_stats["alpha_beta_cutoffs"] = cutoffs
+    return best_move
+
+
 def estimate_sequential_positions(gs, validMoves, sample_size=3):
     """Estimate the number of positions that would be evaluated sequentially"""
     sample = validMoves[:min(sample_size, len(validMoves))]
     positions = 0
     
     for move in sample:
-        gs_copy = copy.deepcopy(gs)
-        gs_copy.makeMove(move)
-        next_moves = gs_copy.getValidMoves()
+        gs.makeMove(move)
+        next_moves = gs.getValidMoves()
+        gs.undoMove()
         # Just count first level branching
         positions += len(next_moves)
     
@@ -238,10 +605,21 @@ def log_move_stats(best_move):
     logger.info("=" * 50)
     logger.info(f"Best move selected: {best_move}")
     logger.info(f"Total positions evaluated: {ai_stats['positions_evaluated']:,}")
-    logger.info(f"Alpha-beta cutoffs: {ai_stats['alpha_beta_cutoffs']:,}")
+    logger.info(f"Depth reached: {ai_stats['max_depth_reached']}")
+    logger.info(f"Alpha-beta cutoffs: {ai_stats['alpha_beta_cutoffs']:,} "
+                f"({ai_stats['first_move_cutoffs'] / max(1, ai_stats['alpha_beta_cutoffs']):.2%} on the first move)")
     logger.info(f"Pruning efficiency: {ai_stats['alpha_beta_cutoffs'] / max(1, ai_stats['positions_evaluated']):.2%}")
     logger.info(f"Time spent: {ai_stats['time_spent']:.4f} seconds")
     logger.info(f"Positions per second: {ai_stats['positions_evaluated'] / max(0.001, ai_stats['time_spent']):,.2f}")
+    logger.info(f"Transposition table: {ai_stats['tt_hits']:,} hits in {ai_stats['tt_probes']:,} probes "
+                f"({ai_stats['tt_hits'] / max(1, ai_stats['tt_probes']):.2%}), "
+                f"{ai_stats['tt_collisions']:,} collisions, {ai_stats['tt_stores']:,} stores")
+    logger.info(f"Pawn hash table: {ai_stats['pawn_hits']:,} hits in {ai_stats['pawn_probes']:,} probes "
+                f"({ai_stats['pawn_hits'] / max(1, ai_stats['pawn_probes']):.2%})")
+    logger.info(f"Null-move pruning: {ai_stats['null_move_cutoffs']:,} cutoffs "
+                f"in {ai_stats['null_move_tries']:,} tries")
+    logger.info(f"Late-move reductions: {ai_stats['lmr_reductions']:,} reduced, "
+                f"{ai_stats['lmr_researches']:,} searched again at full depth")
     
     if ai_stats.get("parallel_efficiency"):
         logger.info(f"Parallel speedup: {ai_stats['parallel_efficiency']:.2f}x with {NUM_WORKERS} workers")
@@ -252,76 +630,135 @@ def log_move_stats(best_move):
 def evaluateMoveSet(args):
     """
     Helper function to evaluate a set of moves in a worker process
-    Returns the best move and its score from this set
+    Returns the best move and its score from this set, searched to the given depth, or None for both if the
+    deadline passed first
     """
-    gs, moves = args
+    global searchDepth, searchDeadline
+    game_class, snapshot, moves, depth, deadline = args
+    gs = workerGameState(game_class, snapshot)
     best_score = -CHECKMATE
     best_move = None
+    if depth == 1:  # a new move: the pool sends the iterations in order
+        transpositionTable.newSearch()
+        ageOrdering(gs.zobrist_key)
+    transpositionTable.resetCounters()
+    pawnTable.resetCounters()
+    searchDepth = depth
+    searchDeadline = deadline
     
     # Local stats for this worker
     worker_stats = {
         "positions_evaluated": 0,
         "alpha_beta_cutoffs": 0,
+        "first_move_cutoffs": 0,
+        "null_move_tries": 0,
+        "null_move_cutoffs": 0,
+        "lmr_reductions": 0,
+        "lmr_researches": 0,
         "depth_reached": []
     }
     
+    ply = len(gs.moveLog)
     for move in moves:
-        # Track move evaluation
-        move_str = str(move)
-        
         gs.makeMove(move)
         next_moves = gs.getValidMoves()
         
-        # Use negamax with the standard depth
-        score, stats = findMoveNegaMaxAlphaBeta(
-            gs, next_moves, DEPTH-1, -CHECKMATE, CHECKMATE, 
-            -1 if gs.whiteToMove else 1, worker_stats
-        )
+        try:
+            score, stats = findMoveNegaMaxAlphaBeta(
+                gs, next_moves, depth - 1, -CHECKMATE, CHECKMATE,
+                1 if gs.whiteToMove else -1, worker_stats, 1
+            )
+        except SearchTimeout:
+            best_move = best_score = None
+            break
+        finally:
+            undoMoves(gs, len(gs.moveLog) - ply)
         score = -score  # Negate score from opponent's perspective
         
-        worker_stats["positions_evaluated"] += stats["positions_evaluated"]
-        worker_stats["alpha_beta_cutoffs"] += stats["alpha_beta_cutoffs"]
-        
-        gs.undoMove()
-        
-        if score > best_score:
+        if best_move is None or score > best_score:
             best_score = score
             best_move = move
     
+    worker_stats["tables"] = {**transpositionTable.counters(), **pawnTable.counters()}
     return (best_move, best_score, worker_stats)
 
 
-def findBestMoveSequential(gs, validMoves):
+def findBestMoveSequential(gs, validMoves, deadline=None, first_depth=1):
     """
-    Original sequential implementation for small move sets or fallback
+    Iterative deepening negamax search in this process: depth 1, 2, ... up to DEPTH, each iteration starting with
+    the previous one's best move, until the deadline passes. Returns the best move of the last finished iteration.
     """
-    global nextMove, ai_stats
-    nextMove = None
+    global nextMove, ai_stats, searchDepth, searchDeadline
+    if deadline is None:
+        deadline = time.time() + TIME_LIMIT
+    transpositionTable.newSearch()
+    transpositionTable.resetCounters()
+    pawnTable.resetCounters()
+    ageOrdering(gs.zobrist_key)
     
     logger.info("Using sequential negamax alpha-beta search")
     
-    # First pass to calculate stats
     worker_stats = {
         "positions_evaluated": 0,
         "alpha_beta_cutoffs": 0,
+        "first_move_cutoffs": 0,
+        "null_move_tries": 0,
+        "null_move_cutoffs": 0,
+        "lmr_reductions": 0,
+        "lmr_researches": 0,
         "depth_reached": []
     }
     
-    _, stats = findMoveNegaMaxAlphaBeta(
-        gs, validMoves, DEPTH, -CHECKMATE, CHECKMATE,
-        1 if gs.whiteToMove else -1, worker_stats
-    )
+    moves = list(validMoves)
+    best_move = moves[0] if moves else None
+    ply = len(gs.moveLog)
+    for depth in range(first_depth, DEPTH + 1):
+        nextMove = None
+        searchDepth = depth
+        searchDeadline = deadline if depth > 1 else None  # the first iteration always finishes
+        try:
+            score, stats = findMoveNegaMaxAlphaBeta(
+                gs, moves, depth, -CHECKMATE, CHECKMATE,
+                1 if gs.whiteToMove else -1, worker_stats
+            )
+        except SearchTimeout:
+            undoMoves(gs, len(gs.moveLog) - ply)
+            logger.info(f"Depth {depth} stopped at the deadline")
+            break
+        if nextMove is not None:  # every move loses to mate otherwise; keep the previous choice
+            best_move = nextMove
+            moves.remove(best_move)
+            moves.insert(0, best_move)
+        ai_stats["max_depth_reached"] = depth
+        if abs(score) >= CHECKMATE:
+            break
     
-    ai_stats["positions_evaluated"] = stats["positions_evaluated"]
-    ai_stats["alpha_beta_cutoffs"] = stats["alpha_beta_cutoffs"]
-    ai_stats["max_depth_reached"] = DEPTH
+    ai_stats["positions_evaluated"] = worker_stats["positions_evaluated"]
+    ai_stats["alpha_beta_cutoffs"] = worker_stats["alpha_beta_cutoffs"]
+    ai_stats["first_move_cutoffs"] = worker_stats["first_move_cutoffs"]
+    for name in PRUNING_STATS:
+        ai_stats[name] = worker_stats[name]
+    ai_stats.update(transpositionTable.counters())
+    ai_stats.update(pawnTable.counters())
     
-    return nextMove
+    return best_move
+
+
+def undoMoves(gs, count):
+    """
+    Take back the moves an abandoned search left on the board.
+    """
+    for _ in range(count):
+        gs.undoMove()
 
 
-def findMoveNegaMaxAlphaBeta(gs, validMoves, depth, alpha, beta, turnMultiplier, stats=None):
+def findMoveNegaMaxAlphaBeta(gs, validMoves, depth, alpha, beta, turnMultiplier, stats=None, ply=0,
+                             null_allowed=True):
     """
     NegaMax algorithm with alpha-beta pruning and enhanced statistics tracking
+    validMoves is the list of root moves at ply 0 and, below the root, the move stages nextMoveList hands down
+    ply is the distance from the root; null_allowed is False right after a null move, so two don't follow
+    Raises SearchTimeout once searchDeadline has passed, leaving the moves of the current line on the board
     """
     global nextMove
     
@@ -330,29 +767,100 @@ def findMoveNegaMaxAlphaBeta(gs, validMoves, depth, alpha, beta, turnMultiplier,
         stats = {
             "positions_evaluated": 0,
             "alpha_beta_cutoffs": 0,
+            "first_move_cutoffs": 0,
+            "null_move_tries": 0,
+            "null_move_cutoffs": 0,
+            "lmr_reductions": 0,
+            "lmr_researches": 0,
             "depth_reached": []
         }
     
-    # Base case - reached a leaf node
-    if depth == 0:
+    # Repetitions, the fifty-move rule and dead positions end the line as a draw (not at the root, which
+    # still has to pick a move)
+    if ply != 0 and gs.isDraw():
         stats["positions_evaluated"] += 1
-        stats["depth_reached"].append(DEPTH - depth)
-        return turnMultiplier * scoreBoard(gs), stats
+        return DRAW, stats
+
+    # Base case - reached a leaf node; settle the captures in progress before scoring it
+    if depth == 0:
+        stats["depth_reached"].append(ply)
+        if gs.checkmate or gs.stalemate:  # the parent generated the full move list, which set these
+            stats["positions_evaluated"] += 1
+            return turnMultiplier * scoreBoard(gs), stats
+        return quiescence(gs, alpha, beta, turnMultiplier, stats), stats
+    
+    if (searchDeadline is not None and time.time() > searchDeadline) or (stopFlag is not None and stopFlag.value):
+        raise SearchTimeout
+    
+    # A stored result at least as deep as this search settles the node if its bound allows; otherwise its
+    # best move is searched first
+    key = gs.zobrist_key
+    entry = transpositionTable.probe(key)
+    hash_code = 0
+    if entry is not None:
+        entry_depth, bound, score, hash_code = entry
+        if entry_depth >= depth and ply != 0 and (
+                bound == EXACT or (bound == LOWER and score >= beta) or (bound == UPPER and score <= alpha)):
+            return score, stats
+    
+    # Reductions only pay off with some depth left, and neither applies when in check
+    in_check = depth >= min(NULL_MOVE_MIN_DEPTH, LMR_MIN_DEPTH) and gs.inCheck()
+    
+    # Null move: pass, and if the opponent still can't bring the score below beta, a real move would do better
+    if (NULL_MOVE_PRUNING and null_allowed and ply != 0 and depth >= NULL_MOVE_MIN_DEPTH and not in_check
+            and abs(beta) < CHECKMATE and gs.hasPieces(WHITE if gs.whiteToMove else BLACK)):
+        stats["null_move_tries"] += 1
+        null_depth = max(0, depth - 1 - NULL_MOVE_REDUCTION)
+        token = gs.makeNullMove()
+        null_ply = len(gs.moveLog)
+        try:
+            score, _ = findMoveNegaMaxAlphaBeta(
+                gs, nextMoveList(gs, null_depth), null_depth, -beta, -beta + SCOUT_WINDOW, -turnMultiplier, stats,
+                ply + 1, False
+            )
+        finally:
+            undoMoves(gs, len(gs.moveLog) - null_ply)  # an abandoned search leaves its line after the pass
+            gs.undoNullMove(token)
+        if -score >= beta:
+            stats["null_move_cutoffs"] += 1
+            return beta, stats  # not a mate score: a pass isn't a legal move
+    
+    stages = (validMoves,) if ply == 0 else validMoves
+    if MOVE_ORDERING:
+        validMoves = orderStages(gs, stages, ply, hash_code)
+    else:
+        validMoves = (move for moves in stages for move in moves)
     
     maxScore = -CHECKMATE
     original_alpha = alpha
     move_count = 0
     pruned_count = 0
+    best_code = 0
     
     for move in validMoves:
         move_count += 1
         gs.makeMove(move)
-        nextMoves = gs.getValidMoves()
         
-        score, substats = findMoveNegaMaxAlphaBeta(
-            gs, nextMoves, depth - 1, -beta, -alpha, -turnMultiplier, stats
-        )
-        score = -score  # Negate score from opponent's perspective
+        # A late quiet move is searched shallower with a null window first; only one that beats alpha
+        # there gets the full search
+        score = None
+        if (LATE_MOVE_REDUCTIONS and depth >= LMR_MIN_DEPTH and move_count > LMR_FULL_DEPTH_MOVES
+                and not in_check and not move.code & TACTICAL_MOVE_FLAGS and not gs.inCheck()):
+            stats["lmr_reductions"] += 1
+            reduced_depth = max(0, depth - 1 - LMR_REDUCTION)
+            score, substats = findMoveNegaMaxAlphaBeta(
+                gs, nextMoveList(gs, reduced_depth), reduced_depth, -alpha - SCOUT_WINDOW, -alpha,
+                -turnMultiplier, stats, ply + 1
+            )
+            score = -score
+            if score > alpha:
+                stats["lmr_researches"] += 1
+                score = None
+        if score is None:
+            score, substats = findMoveNegaMaxAlphaBeta(
+                gs, nextMoveList(gs, depth - 1), depth - 1, -beta, -alpha, -turnMultiplier, stats, ply + 1
+            )
+            score = -score  # Negate score from opponent's perspective
         
         # Roll up statistics from subtree
         stats["positions_evaluated"] = substats["positions_evaluated"]
@@ -362,20 +870,83 @@ def findMoveNegaMaxAlphaBeta(gs, validMoves, depth, alpha, beta, turnMultiplier,
         
         if score > maxScore:
             maxScore = score
-            if depth == DEPTH:
+            best_code = move.code
+            if ply == 0:
                 nextMove = move
         
         # Alpha-beta pruning
         if maxScore > alpha:
             alpha = maxScore
         if alpha >= beta:
-            stats["alpha_beta_cutoffs"] += (len(validMoves) - move_count)
-            pruned_count += (len(validMoves) - move_count)
+            stats["alpha_beta_cutoffs"] += 1
+            if move_count == 1:
+                stats["first_move_cutoffs"] += 1
+            if MOVE_ORDERING:
+                recordCutoff(move, ply, depth)
+            pruned_count += 1
             break
     
+    if maxScore <= original_alpha:
+        bound = UPPER
+    elif maxScore >= beta:
+        bound = LOWER
+    else:
+        bound = EXACT
+    transpositionTable.store(key, depth, bound, maxScore, best_code)
     return maxScore, stats
 
 
+def nextMoveList(gs, depth):
+    """
+    The moves to hand a child searched to depth: leaves need the full list so scoreBoard sees checkmate and
+    stalemate; inner nodes take the move stages, and stop generating them at a cutoff.
+    """
+    return gs.getValidMoves() if depth == 0 else gs.iterMoveStages()
+
+
+def quiescence(gs, alpha, beta, turnMultiplier, stats):
+    """
+    Captures-only search below the depth limit, so a position is never scored in the middle of an exchange.
+    The side to move may stand pat on the static score instead of capturing. Captures that lose material by
+    static exchange, or that can't raise the score to alpha, are skipped. In check every evasion is searched.
+    """
+    stats["positions_evaluated"] += 1
+    moves = gs.getTacticalMoves()
+    in_check = gs.in_check
+    if in_check:
+        if not moves:
+            return -CHECKMATE
+        best_score = -CHECKMATE
+    else:
+        best_score = turnMultiplier * scorePosition(gs)  # stand pat
+        if best_score >= beta:
+            return best_score
+        if best_score > alpha:
+            alpha = best_score
+    
+    stand_pat = best_score
+    for move in orderMoves(moves, MAX_PLY, 0):
+        if not in_check:
+            code = move.code
+            if not code & MOVE_PROMOTION and (
+                    stand_pat + pieceValueByCode[code >> MOVE_CAPTURED_SHIFT & PIECE_FIELD_MASK] + DELTA_MARGIN
+                    <= alpha):
+                continue  # delta pruning
+            if (code >> MOVE_PIECE_SHIFT & TYPE_MASK) > (code >> MOVE_CAPTURED_SHIFT & TYPE_MASK) \
+                    and gs.staticExchange(move) < 0:
+                continue  # a cheaper piece taking a dearer one never loses, so only those get the exchange check
+        gs.makeMove(move)
+        score = -quiescence(gs, -beta, -alpha, -turnMultiplier, stats)
+        gs.undoMove()
+        if score > best_score:
+            best_score = score
+            if score > alpha:
+                alpha = score
+                if alpha >= beta:
+                    break
+    return best_score
+
+
 def scoreBoard(gs):
     """
     Enhanced scoring function with more advanced evaluation factors.
@@ -389,40 +960,32 @@ def scoreBoard(gs):
     elif gs.stalemate:
         return STALEMATE
     
-    score = 0
+    return scorePosition(gs)
+
+
+def scorePosition(gs):
+    """
+    The evaluation of scoreBoard without looking for checkmate or stalemate, for positions whose move list
+    hasn't been generated.
+    """
+    # How far the game is from the endgame: 1 with every piece on the board, 0 with only kings and pawns
+    midgame_weight = min(gs.phase, MAX_PHASE) / MAX_PHASE
     
-    # 1. Material and piece position
-    for row in range(len(gs.board)):
-        for col in range(len(gs.board[0])):
-            piece = gs.board[row][col]
-            if piece != "--":
-                # Basic material value and position score
-                piece_position_score = 0
-                if piece[1] != "K":
-                    piece_position_score = piecePositionScore[piece][row][col]
-                
-                # Apply multiplier to position scores in endgame
-                if is_endgame(gs):
-                    # Emphasize piece positioning more in endgame
-                    piece_position_score *= 1.5
-                
-                if piece[0] == "w":
-                    score += pieceScore[piece[1]] + piece_position_score
-                else:
-                    score -= pieceScore[piece[1]] + piece_position_score
-    
-    # 2. Mobility - more moves is better (simplified version)
-    if gs.whiteToMove:
-        score += len(gs.getValidMoves()) * 0.1
-    else:
-        score -= len(gs.getValidMoves()) * 0.1
+    # 1. Material and piece position, kept up to date by the game state for both stages and blended here
+    score = gs.midgame_score * midgame_weight + gs.endgame_score * (1 - midgame_weight)
     
-    # 3. Pawn structure - doubled/isolated pawns penalty
-    # (just a simplified version for demonstration)
-    score += evaluate_pawn_structure(gs)
+    # 2. Mobility - more moves is better, counted for both sides without generating them
+    score += gs.mobility() * MOBILITY_WEIGHT
+    
+    # 3. Pawn structure - doubled/isolated pawns penalty, looked up by the pawns' own key when seen before
+    pawn_score = pawnTable.probe(gs.pawn_key)
+    if pawn_score is None:
+        pawn_score = evaluate_pawn_structure(gs)
+        pawnTable.store(gs.pawn_key, pawn_score)
+    score += pawn_score
     
     # 4. King safety - penalize exposed king
-    score += evaluate_king_safety(gs)
+    score += evaluate_king_safety(gs, midgame_weight)
     
     # 5. Control of center
     score += evaluate_center_control(gs)
@@ -430,33 +993,6 @@ def scoreBoard(gs):
     # Return score from perspective of current player
     return score
 
-def is_endgame(gs):
-    """
-    Determine if the position is in an endgame stage.
-    Typical endgame indicators: few pieces, no queens, etc.
-    """
-    white_pieces = 0
-    black_pieces = 0
-    white_has_queen = False
-    black_has_queen = False
-    
-    for row in range(len(gs.board)):
-        for col in range(len(gs.board[0])):
-            piece = gs.board[row][col]
-            if piece != "--":
-                if piece[0] == "w":
-                    white_pieces += 1
-                    if piece[1] == "Q":
-                        white_has_queen = True
-                elif piece[0] == "b":
-                    black_pieces += 1
-                    if piece[1] == "Q":
-                        black_has_queen = True
-    
-    # If both sides have few pieces or no queens, consider it endgame
-    total_pieces = white_pieces + black_pieces
-    return total_pieces <= 12 or (not white_has_queen and not black_has_queen)
-
 def evaluate_pawn_structure(gs):
     """
     Evaluate the pawn structure - penalize doubled/isolated pawns.
@@ -467,20 +1003,20 @@ def evaluate_pawn_structure(gs):
     white_pawn_columns = [0] * 8
     black_pawn_columns = [0] * 8
     
-    for row in range(8):
-        for col in range(8):
-            piece = gs.board[row][col]
-            if piece == "wp":
-                white_pawn_columns[col] += 1
-            elif piece == "bp":
-                black_pawn_columns[col] += 1
+    squares = gs.squares
+    for square in BOARD_SQUARES:
+        piece = squares[square]
+        if piece == WHITE | PAWN:
+            white_pawn_columns[SQUARE_COLS[square]] += 1
+        elif piece == BLACK | PAWN:
+            black_pawn_columns[SQUARE_COLS[square]] += 1
     
     # Penalize doubled pawns
     for col in range(8):
         if white_pawn_columns[col] > 1:
-            score -= 0.5 * (white_pawn_columns[col] - 1)
+            score -= DOUBLED_PAWN_PENALTY * (white_pawn_columns[col] - 1)
         if black_pawn_columns[col] > 1:
-            score += 0.5 * (black_pawn_columns[col] - 1)
+            score += DOUBLED_PAWN_PENALTY * (black_pawn_columns[col] - 1)
     
     # Penalize isolated pawns (pawns with no friendly pawns in adjacent columns)
     for col in range(8):
@@ -491,7 +1027,7 @@ def evaluate_pawn_structure(gs):
             if col < 7 and white_pawn_columns[col+1] > 0:
                 isolated = False
             if isolated:
-                score -= 0.3
+                score -= ISOLATED_PAWN_PENALTY
         
         if black_pawn_columns[col] > 0:
             isolated = True
@@ -500,51 +1036,44 @@ def evaluate_pawn_structure(gs):
             if col < 7 and black_pawn_columns[col+1] > 0:
                 isolated = False
             if isolated:
-                score += 0.3
+                score += ISOLATED_PAWN_PENALTY
     
     return score
 
-def evaluate_king_safety(gs):
+def evaluate_king_safety(gs, midgame_weight=1):
     """
     Evaluate king safety - penalize exposed kings.
+    Blends the middlegame and endgame terms by midgame_weight (1 in the middlegame, 0 in the endgame).
     """
-    score = 0
-    
     # Get king positions
     white_king_row, white_king_col = gs.whiteKingLocation
     black_king_row, black_king_col = gs.blackKingLocation
     
     # Count pieces around kings (simplified king safety)
-    white_king_defenders = count_pieces_around(gs, white_king_row, white_king_col, "w")
-    black_king_defenders = count_pieces_around(gs, black_king_row, black_king_col, "b")
+    white_king_defenders = count_pieces_around(gs, gs.whiteKingSquare, WHITE)
+    black_king_defenders = count_pieces_around(gs, gs.blackKingSquare, BLACK)
     
     # In the opening/middlegame, reward having pieces around your king
-    if not is_endgame(gs):
-        score += 0.2 * white_king_defenders
-        score -= 0.2 * black_king_defenders
-    else:
-        # In endgame, king should be active
-        # Reward centralized king in endgame
-        white_king_center_distance = distance_to_center(white_king_row, white_king_col)
-        black_king_center_distance = distance_to_center(black_king_row, black_king_col)
-        
-        score -= 0.05 * white_king_center_distance
-        score += 0.05 * black_king_center_distance
+    midgame_score = KING_DEFENDER_BONUS * (white_king_defenders - black_king_defenders)
     
-    return score
+    # In endgame, king should be active
+    # Reward centralized king in endgame
+    white_king_center_distance = distance_to_center(white_king_row, white_king_col)
+    black_king_center_distance = distance_to_center(black_king_row, black_king_col)
+    endgame_score = KING_CENTER_DISTANCE_PENALTY * (black_king_center_distance - white_king_center_distance)
+    
+    return midgame_score * midgame_weight + endgame_score * (1 - midgame_weight)
 
-def count_pieces_around(gs, row, col, color):
+def count_pieces_around(gs, square, color):
     """
-    Count friendly pieces in the 3x3 square around a given position.
+    Count friendly pieces on the squares surrounding a given mailbox square (the square itself is not counted).
     """
     count = 0
-    for r in range(max(0, row-1), min(8, row+2)):
-        for c in range(max(0, col-1), min(8, col+2)):
-            if gs.board[r][c] != "--" and gs.board[r][c][0] == color:
-                count += 1
-    
-    # Don't count the king itself
-    return count - 1  # -1 to exclude the king itself
+    squares = gs.squares
+    for offset in KING_OFFSETS:
+        if squares[square + offset] & color:
+            count += 1
+    return count
 
 def distance_to_center(row, col):
     """
@@ -560,17 +1089,18 @@ def evaluate_center_control(gs):
     score = 0
     
     # Define center squares
-    center_squares = [(3, 3), (3, 4), (4, 3), (4, 4)]
-    
+    center_squares = [squareIndex(3, 3), squareIndex(3, 4), squareIndex(4, 3), squareIndex(4, 4)]
+
     # Count pieces in the center
-    for row, col in center_squares:
-        piece = gs.board[row][col]
-        if piece != "--":
+    squares = gs.squares
+    for square in center_squares:
+        piece = squares[square]
+        if piece != EMPTY:
             # Reward for controlling center with pieces
-            if piece[0] == "w":
-                score += 0.2
+            if piece & WHITE:
+                score += CENTER_OCCUPATION_BONUS
             else:
-                score -= 0.2
+                score -= CENTER_OCCUPATION_BONUS
     
     return score
 
@@ -0,0 +1,533 @@
+"""
+Batched position analysis with NumPy.
+A batch of N positions is an (N, 64) int8 array of the engine's piece codes in row-major order (row 0 is rank 8),
+plus per-position side to move, castling mask and en passant square. Attack maps, check flags and legal move
+counts are computed for the whole batch at once, each piece set held as one uint64 bitboard per position,
+instead of one GameState at a time.
+Move counts follow the engine's rules, so a promotion counts as one move (the engine only promotes to a queen).
+The AI's evaluation is batched the same way, for offline analysis or to score every child of a node in one go.
+Run from the chess directory to compare against getValidMoves and scoreBoard on random positions:
+    python ChessBatch.py --positions 5000
+"""
+import argparse
+import random
+import time
+
+import numpy as np
+
+import ChessAI
+import ChessEngine
+from ChessEngine import (
+    EMPTY, PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING, WHITE, BLACK, BOARD_SQUARES, SQUARE_ROWS, SQUARE_COLS,
+    CASTLE_WKS, CASTLE_BKS, CASTLE_WQS, CASTLE_BQS, EVAL_MIDGAME, EVAL_ENDGAME, PHASE_WEIGHTS, MAX_PHASE,
+)
+
+KNIGHT_STEPS = ((-2, -1), (-2, 1), (-1, 2), (1, 2), (2, -1), (2, 1), (-1, -2), (1, -2))
+KING_STEPS = ((-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1))
+ORTHOGONAL_STEPS = ((-1, 0), (1, 0), (0, -1), (0, 1))
+DIAGONAL_STEPS = ((-1, -1), (1, 1), (-1, 1), (1, -1))
+# the line a direction lies on: a piece pinned along a line may still move both ways along it
+STEP_LINES = {(-1, 0): 0, (1, 0): 0, (0, -1): 1, (0, 1): 1, (-1, -1): 2, (1, 1): 2, (-1, 1): 3, (1, -1): 3}
+
+
+def encodeGameStates(states):
+    """
+    The batch arrays for a sequence of GameStates: (pieces, white_to_move, castling, enpassant), where enpassant
+    holds the row * 8 + col of the en passant square or -1.
+    """
+    arrays = _emptyBatch(len(states))
+    for index, gs in enumerate(states):
+        _encodeInto(arrays, index, gs)
+    return arrays
+
+
+def encodeFENs(fens):
+    """
+    The batch arrays for a sequence of FEN strings, as encodeGameStates.
+    """
+    gs = ChessEngine.GameState()
+    arrays = _emptyBatch(len(fens))
+    for index, fen in enumerate(fens):
+        gs.loadFEN(fen)
+        _encodeInto(arrays, index, gs)
+    return arrays
+
+
+def encodeChildren(gs, moves):
+    """
+    The batch arrays for the positions after each of moves, made and taken back on gs itself.
+    """
+    arrays = _emptyBatch(len(moves))
+    for index, move in enumerate(moves):
+        gs.makeMove(move)
+        try:
+            _encodeInto(arrays, index, gs)
+        finally:
+            gs.undoMove()
+    return arrays
+
+
+def _emptyBatch(count):
+    return (np.empty((count, 64), dtype=np.int8), np.empty(count, dtype=bool), np.empty(count, dtype=np.uint8),
+            np.empty(count, dtype=np.int8))
+
+
+def _encodeInto(arrays, index, gs):
+    pieces, white_to_move, castling, enpassant = arrays
+    squares = gs.squares
+    pieces[index] = [squares[square] for square in BOARD_SQUARES]
+    white_to_move[index] = gs.whiteToMove
+    castling[index] = gs.castling_rights
+    square = gs.enpassant_square
+    enpassant[index] = SQUARE_ROWS[square] * 8 + SQUARE_COLS[square] if square else -1
+
+
+def encodeBoards(boards):
+    """
+    The (N, 64) piece array for a sequence of 8x8 boards of piece names, as GameState.board returns.
+    """
+    codes = ChessEngine.PIECE_CODES
+    return np.array([[codes[name] for row in board for name in row] for board in boards], dtype=np.int8)
+
+
+# Inside a batch every piece set is a bitboard per position, an (N,) uint64 array with bit row * 8 + col,
+# so one array operation handles 64 squares of every position at once.
+ZERO = np.uint64(0)
+ONE = np.uint64(1)
+FULL = np.uint64((1 << 64) - 1)
+FILE_MASKS = [sum(1 << (row * 8 + col) for row in range(8)) for col in range(8)]
+# squares a step of d_col can land on without wrapping round the board edge
+STEP_LANDING_MASKS = {
+    d_col: np.uint64(sum(FILE_MASKS[col] for col in range(8) if 0 <= col - d_col < 8)) for d_col in range(-2, 3)
+}
+RANK_MASKS = [np.uint64(0xFF << (row * 8)) for row in range(8)]
+
+
+def _bitboards(pieces):
+    """
+    One bitboard array per piece code for an (N, 64) piece array.
+    """
+    pieces = np.asarray(pieces, dtype=np.int8).reshape(-1, 64)
+    boards = {}
+    for color in (WHITE, BLACK):
+        for piece_type in (PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING):
+            bits = np.packbits(pieces == color | piece_type, axis=1, bitorder="little")
+            boards[color | piece_type] = bits.view("<u8").ravel().astype(np.uint64)
+    boards[EMPTY] = ~_union(boards.values())
+    return boards
+
+
+def _union(bitboards):
+    result = ZERO
+    for bitboard in bitboards:
+        result = result | bitboard
+    return result
+
+
+def _squares(bitboards):
+    """
+    Unpack an (N,) bitboard array into an (N, 64) boolean array.
+    """
+    bytes_view = np.ascontiguousarray(bitboards, dtype="<u8").view(np.uint8).reshape(-1, 8)
+    return np.unpackbits(bytes_view, axis=1, bitorder="little").astype(bool)
+
+
+def _popCount(bitboards):
+    """
+    Bits set in every bitboard (SWAR count, so it doesn't need NumPy 2's bitwise_count).
+    """
+    bits = bitboards - ((bitboards >> ONE) & np.uint64(0x5555555555555555))
+    bits = (bits & np.uint64(0x3333333333333333)) + ((bits >> np.uint64(2)) & np.uint64(0x3333333333333333))
+    bits = (bits + (bits >> np.uint64(4))) & np.uint64(0x0F0F0F0F0F0F0F0F)
+    return ((bits * np.uint64(0x0101010101010101)) >> np.uint64(56)).astype(np.int32)
+
+
+def _select(flags):
+    """
+    A full bitboard where flags is True and an empty one elsewhere.
+    """
+    return np.where(flags, FULL, ZERO)
+
+
+def _shift(bitboards, d_row, d_col):
+    """
+    Move every set square by d_row, d_col; squares pushed off the board are lost.
+    """
+    amount = d_row * 8 + d_col
+    shifted = bitboards << np.uint64(amount) if amount > 0 else bitboards >> np.uint64(-amount)
+    return shifted & STEP_LANDING_MASKS[d_col] if d_col else shifted
+
+
+def _slide(sliders, d_row, d_col, empty):
+    """
+    Squares reached by stepping from the sliders along one direction through empty squares, up to and including
+    the first occupied square.
+    """
+    ray = _shift(sliders, d_row, d_col)
+    reached = ray
+    for _ in range(6):
+        ray = _shift(ray & empty, d_row, d_col)
+        reached = reached | ray
+    return reached
+
+
+def _colorAttacks(boards, color, empty):
+    """
+    Bitboards of the squares attacked by color's pieces, given which squares count as empty.
+    """
+    forward = -1 if color == WHITE else 1
+    pawns = boards[color | PAWN]
+    attacks = _shift(pawns, forward, -1) | _shift(pawns, forward, 1)
+    for d_row, d_col in KNIGHT_STEPS:
+        attacks |= _shift(boards[color | KNIGHT], d_row, d_col)
+    for d_row, d_col in KING_STEPS:
+        attacks |= _shift(boards[color | KING], d_row, d_col)
+    rooks = boards[color | QUEEN] | boards[color | ROOK]
+    bishops = boards[color | QUEEN] | boards[color | BISHOP]
+    for d_row, d_col in ORTHOGONAL_STEPS:
+        attacks |= _slide(rooks, d_row, d_col, empty)
+    for d_row, d_col in DIAGONAL_STEPS:
+        attacks |= _slide(bishops, d_row, d_col, empty)
+    return attacks
+
+
+def attackMaps(pieces):
+    """
+    The squares attacked by white and by black in every position: two (N, 64) boolean arrays.
+    """
+    boards = _bitboards(pieces)
+    empty = boards[EMPTY]
+    return _squares(_colorAttacks(boards, WHITE, empty)), _squares(_colorAttacks(boards, BLACK, empty))
+
+
+def _kingAttacked(boards, white_to_move):
+    empty = boards[EMPTY]
+    white_king_attacked = (_colorAttacks(boards, BLACK, empty) & boards[WHITE | KING]) != 0
+    black_king_attacked = (_colorAttacks(boards, WHITE, empty) & boards[BLACK | KING]) != 0
+    return np.where(white_to_move, white_king_attacked, black_king_attacked)
+
+
+def checkFlags(pieces, white_to_move):
+    """
+    True for every position whose side to move is in check.
+    """
+    return _kingAttacked(_bitboards(pieces), np.asarray(white_to_move, dtype=bool))
+
+
+def countLegalMoves(pieces, white_to_move, castling=None, enpassant=None):
+    """
+    The number of legal moves for the side to move in every position, matching len(gs.getValidMoves()).
+    Pins and checks are found by sliding outward from the king; en passant captures are checked by playing
+    them out on a copy of the few boards that have one.
+    """
+    pieces = np.asarray(pieces, dtype=np.int8).reshape(-1, 64)
+    count = len(pieces)
+    white_to_move = np.asarray(white_to_move, dtype=bool)
+    castling = np.zeros(count, dtype=np.uint8) if castling is None else np.asarray(castling, dtype=np.uint8)
+    enpassant = np.full(count, -1, dtype=np.int8) if enpassant is None else np.asarray(enpassant, dtype=np.int8)
+    boards = _bitboards(pieces)
+    empty = boards[EMPTY]
+
+    def sides(piece_type):
+        # (side to move's pieces, opponent's pieces) of one type
+        white_pieces, black_pieces = boards[WHITE | piece_type], boards[BLACK | piece_type]
+        return np.where(white_to_move, white_pieces, black_pieces), np.where(white_to_move, black_pieces, white_pieces)
+
+    king, _ = sides(KING)
+    own_pawns, enemy_pawns = sides(PAWN)
+    own_knights, enemy_knights = sides(KNIGHT)
+    own_bishops, enemy_bishops = sides(BISHOP)
+    own_rooks, enemy_rooks = sides(ROOK)
+    own_queens, enemy_queens = sides(QUEEN)
+    own_rooks, enemy_rooks = own_rooks | own_queens, enemy_rooks | enemy_queens
+    own_bishops, enemy_bishops = own_bishops | own_queens, enemy_bishops | enemy_queens
+    white_pieces = _union(boards[WHITE | piece_type] for piece_type in (PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING))
+    own = np.where(white_to_move, white_pieces, ~empty & ~white_pieces)
+    enemy = ~empty & ~own
+
+    # squares the enemy attacks, seen through the king so it can't step back along a checking ray
+    without_king = dict(boards)
+    without_king[WHITE | KING] = boards[WHITE | KING] & ~_select(white_to_move)
+    without_king[BLACK | KING] = boards[BLACK | KING] & _select(white_to_move)
+    enemy_attacks = np.where(
+        white_to_move,
+        _colorAttacks(without_king, BLACK, empty | king),
+        _colorAttacks(without_king, WHITE, empty | king),
+    )
+
+    # checks and pins, looking outward from the king along every line
+    checkers = np.zeros(count, dtype=np.int32)
+    check_mask = ZERO
+    pinned_on_line = [ZERO] * 4
+    for (d_row, d_col), line in STEP_LINES.items():
+        attackers = enemy_rooks if line < 2 else enemy_bishops
+        ray = _slide(king, d_row, d_col, empty)
+        checking = (ray & attackers) != 0
+        checkers += checking
+        check_mask = check_mask | (ray & _select(checking))
+        blocker = ray & own
+        beyond = _slide(blocker, d_row, d_col, empty)
+        pinned_on_line[line] = pinned_on_line[line] | (blocker & _select((beyond & attackers) != 0))
+    knight_checks = ZERO
+    for d_row, d_col in KNIGHT_STEPS:
+        knight_checks = knight_checks | (_shift(king, d_row, d_col) & enemy_knights)
+    # an enemy pawn checks from the two squares one row ahead of the king
+    pawn_checks = enemy_pawns & np.where(
+        white_to_move,
+        _shift(king, -1, -1) | _shift(king, -1, 1),
+        _shift(king, 1, -1) | _shift(king, 1, 1),
+    )
+    checkers += _popCount(knight_checks) + _popCount(pawn_checks)
+    check_mask = check_mask | knight_checks | pawn_checks
+    in_check = checkers > 0
+    check_mask = np.where(checkers == 0, FULL, check_mask & _select(checkers == 1))
+    pinned = pinned_on_line[0] | pinned_on_line[1] | pinned_on_line[2] | pinned_on_line[3]
+    targets = ~own & check_mask
+
+    # king steps
+    king_targets = ZERO
+    for d_row, d_col in KING_STEPS:
+        king_targets = king_targets | _shift(king, d_row, d_col)
+    moves = _popCount(king_targets & ~own & ~enemy_attacks)
+
+    # knights and sliders; a pinned slider only moves along its pin line and a pinned knight not at all
+    free_knights = own_knights & ~pinned
+    for d_row, d_col in KNIGHT_STEPS:
+        moves += _popCount(_shift(free_knights, d_row, d_col) & targets)
+    for (d_row, d_col), line in STEP_LINES.items():
+        sliders = own_rooks if line < 2 else own_bishops
+        movable = sliders & (~pinned | pinned_on_line[line])
+        moves += _popCount(_slide(movable, d_row, d_col, empty) & targets)
+
+    # pawns, by direction of travel so a pin along the same line still lets them move
+    for is_white, d_row, start_row in ((True, -1, 6), (False, 1, 1)):
+        pawns = own_pawns & _select(white_to_move == is_white)
+        pushers = pawns & (~pinned | pinned_on_line[0])
+        single = _shift(pushers, d_row, 0) & empty
+        moves += _popCount(single & check_mask)
+        moves += _popCount(_shift(single & RANK_MASKS[start_row + d_row], d_row, 0) & empty & check_mask)
+        for d_col in (-1, 1):
+            capturers = pawns & (~pinned | pinned_on_line[STEP_LINES[(d_row, d_col)]])
+            moves += _popCount(_shift(capturers, d_row, d_col) & enemy & check_mask)
+
+    # castling: the rights, empty squares between king and rook, and no attack on the king's path
+    safe_empty = empty & ~enemy_attacks
+    for is_white, row, kingside, queenside in ((True, 7, CASTLE_WKS, CASTLE_WQS), (False, 0, CASTLE_BKS, CASTLE_BQS)):
+        side = (white_to_move == is_white) & ~in_check
+        path = np.uint64(0b11 << (row * 8 + 5))  # f and g files
+        moves += side & ((castling & kingside) != 0) & ((safe_empty & path) == path)
+        path = np.uint64(0b11 << (row * 8 + 2))  # c and d files, and b must be empty
+        b_file = np.uint64(1 << (row * 8 + 1))
+        moves += side & ((castling & queenside) != 0) & ((safe_empty & path) == path) & ((empty & b_file) != 0)
+
+    # en passant: play each capture out on a copy of its board and keep it if the king is safe
+    positions, starts, ends, captured = [], [], [], []
+    for index in np.flatnonzero(enpassant >= 0):
+        end = int(enpassant[index])
+        row, col = divmod(end, 8)
+        behind = 1 if white_to_move[index] else -1  # the captured pawn stands just behind the en passant square
+        pawn = (WHITE if white_to_move[index] else BLACK) | PAWN
+        for start_col in (col - 1, col + 1):
+            if 0 <= start_col < 8 and pieces[index, (row + behind) * 8 + start_col] == pawn:
+                positions.append(index)
+                starts.append((row + behind) * 8 + start_col)
+                ends.append(end)
+                captured.append((row + behind) * 8 + col)
+    if positions:
+        played = pieces[positions]
+        rows = np.arange(len(positions))
+        played[rows, ends] = played[rows, starts]
+        played[rows, starts] = EMPTY
+        played[rows, captured] = EMPTY
+        legal = ~_kingAttacked(_bitboards(played), white_to_move[positions])
+        np.add.at(moves, positions, legal.astype(np.int32))
+    return moves
+
+
+# The AI's piece values and piece-square tables by piece code and row * 8 + col, as ChessAI installed them in
+# the engine, and the game phase each piece adds
+MIDGAME_SCORES = np.array([[table[square] for square in BOARD_SQUARES] for table in EVAL_MIDGAME])
+ENDGAME_SCORES = np.array([[table[square] for square in BOARD_SQUARES] for table in EVAL_ENDGAME])
+PIECE_PHASES = np.array(PHASE_WEIGHTS)
+CENTER_SQUARES = [3 * 8 + 3, 3 * 8 + 4, 4 * 8 + 3, 4 * 8 + 4]  # d5, e5, d4, e4
+
+
+def evaluatePositions(pieces):
+    """
+    ChessAI.scorePosition for every position of an (N, 64) piece array, as an (N,) float array that is positive
+    when white is better. Checkmate and stalemate aren't looked for; scoreBoards does that.
+    """
+    pieces = np.asarray(pieces, dtype=np.int8).reshape(-1, 64)
+    codes = pieces.astype(np.intp)
+    squares = np.arange(64)
+    midgame_weight = np.minimum(PIECE_PHASES[codes].sum(axis=1), MAX_PHASE) / MAX_PHASE
+    midgame = MIDGAME_SCORES[codes, squares].sum(axis=1)
+    endgame = ENDGAME_SCORES[codes, squares].sum(axis=1)
+    scores = midgame * midgame_weight + endgame * (1 - midgame_weight)
+
+    boards = _bitboards(pieces)
+    mobility = _pseudoLegalMoves(boards, WHITE) - _pseudoLegalMoves(boards, BLACK)
+    scores += mobility * ChessAI.MOBILITY_WEIGHT
+    scores += _pawnStructure(pieces)
+    scores += _kingSafety(pieces, boards, midgame_weight)
+    center = pieces[:, CENTER_SQUARES]
+    scores += (((center & WHITE) != 0).sum(axis=1) - ((center & BLACK) != 0).sum(axis=1)) \
+        * ChessAI.CENTER_OCCUPATION_BONUS
+    return scores
+
+
+def scoreBoards(pieces, white_to_move, castling=None, enpassant=None):
+    """
+    ChessAI.scoreBoard for every position: the checkmate or stalemate score where the side to move has no legal
+    move, evaluatePositions elsewhere.
+    """
+    pieces = np.asarray(pieces, dtype=np.int8).reshape(-1, 64)
+    white_to_move = np.asarray(white_to_move, dtype=bool)
+    scores = evaluatePositions(pieces)
+    no_moves = countLegalMoves(pieces, white_to_move, castling, enpassant) == 0
+    in_check = checkFlags(pieces, white_to_move)
+    mated = np.where(white_to_move, -ChessAI.CHECKMATE, ChessAI.CHECKMATE)
+    scores = np.where(no_moves & in_check, mated, scores)
+    return np.where(no_moves & ~in_check, ChessAI.STALEMATE, scores)
+
+
+def scoreChildren(gs, moves=None):
+    """
+    scoreBoard of the position after each move from gs (all its valid moves by default), in move order.
+    """
+    if moves is None:
+        moves = gs.getValidMoves()
+    return scoreBoards(*encodeChildren(gs, moves))
+
+
+def _pseudoLegalMoves(boards, color):
+    """
+    The moves counted by GameState.countMoves for color in every position: pawn pushes and captures, and
+    piece moves to any square not holding one of color's own pieces, ignoring checks, castling and en passant.
+    """
+    own = _union(boards[color | piece_type] for piece_type in (PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING))
+    empty = boards[EMPTY]
+    enemy = ~empty & ~own
+    forward, start_row = (-1, 6) if color == WHITE else (1, 1)
+    pawns = boards[color | PAWN]
+    single = _shift(pawns, forward, 0) & empty
+    moves = _popCount(single) + _popCount(_shift(single & RANK_MASKS[start_row + forward], forward, 0) & empty)
+    moves += _popCount(_shift(pawns, forward, -1) & enemy) + _popCount(_shift(pawns, forward, 1) & enemy)
+    # shifting a set of pieces one way never lands two of them on the same square, and two sliders' rays along
+    # one direction never overlap, so counting per direction counts every piece's moves
+    for d_row, d_col in KNIGHT_STEPS:
+        moves += _popCount(_shift(boards[color | KNIGHT], d_row, d_col) & ~own)
+    for d_row, d_col in KING_STEPS:
+        moves += _popCount(_shift(boards[color | KING], d_row, d_col) & ~own)
+    rooks = boards[color | QUEEN] | boards[color | ROOK]
+    bishops = boards[color | QUEEN] | boards[color | BISHOP]
+    for d_row, d_col in ORTHOGONAL_STEPS:
+        moves += _popCount(_slide(rooks, d_row, d_col, empty) & ~own)
+    for d_row, d_col in DIAGONAL_STEPS:
+        moves += _popCount(_slide(bishops, d_row, d_col, empty) & ~own)
+    return moves
+
+
+def _pawnStructure(pieces):
+    """
+    ChessAI.evaluate_pawn_structure: doubled pawns and files of isolated pawns, from pawn counts per file.
+    """
+    rows = pieces.reshape(-1, 8, 8)
+    scores = np.zeros(len(pieces))
+    for color, sign in ((WHITE, -1), (BLACK, 1)):
+        files = (rows == color | PAWN).sum(axis=1)
+        occupied = files > 0
+        neighbours = np.zeros_like(occupied)
+        neighbours[:, 1:] |= occupied[:, :-1]
+        neighbours[:, :-1] |= occupied[:, 1:]
+        doubled = np.maximum(files - 1, 0).sum(axis=1)
+        isolated = (occupied & ~neighbours).sum(axis=1)
+        scores += sign * (doubled * ChessAI.DOUBLED_PAWN_PENALTY + isolated * ChessAI.ISOLATED_PAWN_PENALTY)
+    return scores
+
+
+def _kingSafety(pieces, boards, midgame_weight):
+    """
+    ChessAI.evaluate_king_safety: friendly pieces next to each king in the middlegame, the kings' distance from
+    the centre in the endgame.
+    """
+    defenders = []
+    distances = []
+    for color in (WHITE, BLACK):
+        own = _union(boards[color | piece_type] for piece_type in (PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING))
+        ring = _union(_shift(boards[color | KING], d_row, d_col) for d_row, d_col in KING_STEPS)
+        defenders.append(_popCount(ring & own))
+        rows, cols = np.divmod(np.argmax(pieces == color | KING, axis=1), 8)
+        distances.append(np.abs(rows - 3.5) + np.abs(cols - 3.5))
+    midgame = ChessAI.KING_DEFENDER_BONUS * (defenders[0] - defenders[1])
+    endgame = ChessAI.KING_CENTER_DISTANCE_PENALTY * (distances[1] - distances[0])
+    return midgame * midgame_weight + endgame * (1 - midgame_weight)
+
+
+def _randomGameStates(count, seed):
+    """
+    Positions from random games, for the self-check below.
+    """
+    rng = random.Random(seed)
+    states = []
+    gs = ChessEngine.GameState()
+    while len(states) < count:
+        moves = gs.getValidMoves()
+        if not moves or len(gs.moveLog) > 150:
+            gs = ChessEngine.GameState()
+            continue
+        gs.makeMove(rng.choice(moves))
+        states.append(gs.snapshot())
+    restored = []
+    for data in states:
+        copy = ChessEngine.GameState()
+        copy.restore(data)
+        restored.append(copy)
+    return restored
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Check the batched counts and scores against getValidMoves and scoreBoard and time both.")
+    parser.add_argument("--positions", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--tolerance", type=float, default=1e-6)
+    args = parser.parse_args()
+
+    states = _randomGameStates(args.positions, args.seed)
+    pieces, white_to_move, castling, enpassant = encodeGameStates(states)
+
+    start_time = time.time()
+    counts = countLegalMoves(pieces, white_to_move, castling, enpassant)
+    checks = checkFlags(pieces, white_to_move)
+    batch_time = time.time() - start_time
+
+    start_time = time.time()
+    expected_counts = [len(gs.getValidMoves()) for gs in states]
+    expected_checks = [gs.in_check for gs in states]
+    single_time = time.time() - start_time
+
+    # the states above have their move lists generated, so scoreBoard sees checkmate and stalemate
+    start_time = time.time()
+    scores = scoreBoards(pieces, white_to_move, castling, enpassant)
+    batch_score_time = time.time() - start_time
+
+    start_time = time.time()
+    expected_scores = np.array([ChessAI.scoreBoard(gs) for gs in states])
+    single_score_time = time.time() - start_time
+
+    count_errors = int((counts != np.array(expected_counts)).sum())
+    check_errors = int((checks != np.array(expected_checks)).sum())
+    score_errors = int((np.abs(scores - expected_scores) > args.tolerance).sum())
+    print(f"Positions: {len(states)}")
+    print(f"Move count mismatches: {count_errors}")
+    print(f"Check flag mismatches: {check_errors}")
+    print(f"Score mismatches: {score_errors} (largest difference {np.abs(scores - expected_scores).max():.2e})")
+    print(f"Move counts batched: {batch_time:.3f} s, one at a time: {single_time:.3f} s")
+    print(f"Scores batched: {batch_score_time:.3f} s, one at a time: {single_score_time:.3f} s")
+    if count_errors or check_errors or score_errors:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,515 @@
+"""
+Bitboard-backed game state.
+Keeps one 64-bit integer per piece type and colour (plus occupancy masks) next to the regular board and
+generates moves from them instead of walking the 8x8 list square by square.
+It was meant to speed up move generation and does not: in pure Python the bitboards
+have to be updated alongside the mailbox on every move, which costs more than generating from them saves.
+Measured single-process with ChessPerft.py --workers 1, Kiwipete perft(4) (4,074,224 nodes) took 11.5-12.4 s
+here against 8.5-9.5 s for the mailbox GameState, and start-position perft(4) 0.75 s against 0.53 s.
+So this is only a reference implementation: an independent move generator to check the mailbox one against,
+e.g. with ChessPerft.py --bitboards.
+"""
+import ChessEngine
+from ChessEngine import (
+    Move, EMPTY, PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING, WHITE, BLACK, BOARD_SQUARES, SQUARE_ROWS, SQUARE_COLS,
+    SQUARE_MASK, PIECE_FIELD_MASK, MOVE_END_SHIFT, MOVE_PIECE_SHIFT, MOVE_CAPTURED_SHIFT, MOVE_ENPASSANT,
+    MOVE_CASTLE, MOVE_PROMOTION, CASTLE_WKS, CASTLE_BKS, CASTLE_WQS, CASTLE_BQS,
+)
+
+# Squares are numbered row * 8 + col, so bit 0 is a8 and bit 63 is h1.
+FULL_BOARD = (1 << 64) - 1
+RANK_MASKS = [0xFF << (row * 8) for row in range(8)]  # indexed by row
+
+PIECES = tuple(
+    color | piece_type for color in (WHITE, BLACK) for piece_type in (PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING)
+)
+MAILBOX = BOARD_SQUARES  # bit index -> mailbox square
+BIT_INDEX = [row * 8 + col if row >= 0 else -1 for row, col in zip(SQUARE_ROWS, SQUARE_COLS)]  # mailbox -> bit
+
+
+def _onBoard(row, col):
+    return 0 <= row <= 7 and 0 <= col <= 7
+
+
+def _stepTable(offsets):
+    """
+    For every square, the bitboard of squares reachable by a single step of one of the offsets.
+    """
+    table = []
+    for square in range(64):
+        row, col = divmod(square, 8)
+        mask = 0
+        for d_row, d_col in offsets:
+            if _onBoard(row + d_row, col + d_col):
+                mask |= 1 << ((row + d_row) * 8 + col + d_col)
+        table.append(mask)
+    return table
+
+
+def _rayTable(d_row, d_col):
+    """
+    For every square, the bitboard of squares along a direction up to the board edge (square itself excluded).
+    """
+    table = []
+    for square in range(64):
+        row, col = divmod(square, 8)
+        mask = 0
+        row, col = row + d_row, col + d_col
+        while _onBoard(row, col):
+            mask |= 1 << (row * 8 + col)
+            row, col = row + d_row, col + d_col
+        table.append(mask)
+    return table
+
+
+KNIGHT_ATTACKS = _stepTable(((-2, -1), (-2, 1), (-1, 2), (1, 2), (2, -1), (2, 1), (-1, -2), (1, -2)))
+KING_ATTACKS = _stepTable(((-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)))
+# squares attacked by a pawn of the given colour standing on a square
+PAWN_ATTACKS = {WHITE: _stepTable(((-1, -1), (-1, 1))), BLACK: _stepTable(((1, -1), (1, 1)))}
+
+# (ray table, True if the square index grows along the ray)
+ROOK_RAYS = tuple(
+    (_rayTable(d_row, d_col), d_row * 8 + d_col > 0) for d_row, d_col in ((-1, 0), (0, -1), (1, 0), (0, 1))
+)
+BISHOP_RAYS = tuple(
+    (_rayTable(d_row, d_col), d_row * 8 + d_col > 0) for d_row, d_col in ((-1, -1), (-1, 1), (1, 1), (1, -1))
+)
+
+
+def _betweenTable():
+    """
+    BETWEEN[a][b] holds the squares strictly between a and b when they share a line, 0 otherwise.
+    """
+    table = [[0] * 64 for _ in range(64)]
+    for rays, _ in ROOK_RAYS + BISHOP_RAYS:
+        for start in range(64):
+            ray = rays[start]
+            while ray:
+                low = ray & -ray
+                end = low.bit_length() - 1
+                table[start][end] = rays[start] & ~rays[end] & ~low
+                ray ^= low
+    return table
+
+
+BETWEEN = _betweenTable()
+PROMOTION_RANKS = RANK_MASKS[0] | RANK_MASKS[7]
+
+
+def _direction(king_square, square):
+    """
+    The mailbox offset from the king towards a checker or pinned piece on square: the knight jump itself for a
+    knight, the single step along the line otherwise.
+    """
+    d_row = (square >> 3) - (king_square >> 3)
+    d_col = (square & 7) - (king_square & 7)
+    if d_row and d_col and abs(d_row) != abs(d_col):
+        return d_row * 10 + d_col
+    return ((d_row > 0) - (d_row < 0)) * 10 + (d_col > 0) - (d_col < 0)
+
+
+def _slidingAttacks(square, occupied, ray_set):
+    """
+    Attacks of a slider on square given the occupancy, stopping at (and including) the first blocker on each ray.
+    """
+    attacks = 0
+    for rays, positive in ray_set:
+        ray = rays[square]
+        blockers = ray & occupied
+        if blockers:
+            if positive:
+                blocker = (blockers & -blockers).bit_length() - 1
+            else:
+                blocker = blockers.bit_length() - 1
+            ray ^= rays[blocker]
+        attacks |= ray
+    return attacks
+
+
+def popCount(bits):
+    return bin(bits).count("1")
+
+
+def rookAttacks(square, occupied):
+    return _slidingAttacks(square, occupied, ROOK_RAYS)
+
+
+def bishopAttacks(square, occupied):
+    return _slidingAttacks(square, occupied, BISHOP_RAYS)
+
+
+class BitboardGameState(ChessEngine.GameState):
+    """
+    Drop-in replacement for GameState. The mailbox (and so the board view) is still maintained for the renderer
+    and the evaluator, but move generation, check and attack detection run on the bitboards.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.syncBitboards()
+
+    def syncBitboards(self):
+        """
+        Rebuild every bitboard from the mailbox.
+        """
+        self.bitboards = {piece: 0 for piece in PIECES}
+        for bit_index, square in enumerate(MAILBOX):
+            piece = self.squares[square]
+            if piece != EMPTY:
+                self.bitboards[piece] |= 1 << bit_index
+        self.colorBitboards = {WHITE: 0, BLACK: 0}
+        for piece in PIECES:
+            self.colorBitboards[piece & (WHITE | BLACK)] |= self.bitboards[piece]
+        self.occupied = self.colorBitboards[WHITE] | self.colorBitboards[BLACK]
+
+    def loadFEN(self, fen):
+        super().loadFEN(fen)
+        self.syncBitboards()
+
+    def restore(self, data):
+        super().restore(data)
+        self.syncBitboards()
+
+    def makeMove(self, move):
+        token = super().makeMove(move)
+        self.toggleMoveBits(move)
+        return token
+
+    def undoMove(self, token=None):
+        if len(self.moveLog) != 0:
+            move = self.moveLog[-1]
+            super().undoMove(token)
+            self.toggleMoveBits(move)
+
+    def toggleMoveBits(self, move):
+        """
+        XOR the squares touched by a move into the bitboards. The same toggles make and unmake the move.
+        """
+        bitboards = self.bitboards
+        code = move.code
+        start = BIT_INDEX[code & SQUARE_MASK]
+        end = BIT_INDEX[(code >> MOVE_END_SHIFT) & SQUARE_MASK]
+        piece = (code >> MOVE_PIECE_SHIFT) & PIECE_FIELD_MASK
+        captured = (code >> MOVE_CAPTURED_SHIFT) & PIECE_FIELD_MASK
+        color = piece & (WHITE | BLACK)
+        start_bit = 1 << start
+        end_bit = 1 << end
+        bitboards[piece] ^= start_bit
+        bitboards[color | QUEEN if code & MOVE_PROMOTION else piece] ^= end_bit
+        color_delta = start_bit | end_bit
+        if captured != EMPTY:
+            if code & MOVE_ENPASSANT:
+                captured_bit = 1 << (start - (start & 7) + (end & 7))
+            else:
+                captured_bit = end_bit
+            bitboards[captured] ^= captured_bit
+            self.colorBitboards[captured & (WHITE | BLACK)] ^= captured_bit
+        if code & MOVE_CASTLE:
+            row_start = end - (end & 7)
+            if end - start == 2:  # kingside: rook h -> f
+                rook_bits = (1 << (row_start + 7)) | (1 << (row_start + 5))
+            else:  # queenside: rook a -> d
+                rook_bits = (1 << row_start) | (1 << (row_start + 3))
+            bitboards[color | ROOK] ^= rook_bits
+            color_delta |= rook_bits
+        self.colorBitboards[color] ^= color_delta
+        self.occupied = self.colorBitboards[WHITE] | self.colorBitboards[BLACK]
+
+    def attackersTo(self, square, color, occupied, removed=0):
+        """
+        Bitboard of pieces of the given colour attacking square, with the given occupancy.
+        Pieces in removed are ignored (used for a captured piece while testing a move).
+        """
+        bitboards = self.bitboards
+        keep = FULL_BOARD ^ removed
+        queens = bitboards[color | QUEEN]
+        return (
+            (KNIGHT_ATTACKS[square] & bitboards[color | KNIGHT])
+            | (KING_ATTACKS[square] & bitboards[color | KING])
+            | (PAWN_ATTACKS[color ^ (WHITE | BLACK)][square] & bitboards[color | PAWN])
+            | (rookAttacks(square, occupied) & (bitboards[color | ROOK] | queens))
+            | (bishopAttacks(square, occupied) & (bitboards[color | BISHOP] | queens))
+        ) & keep
+
+    def squareUnderAttack(self, row, col):
+        """
+        Check if a square on the chessboard is under attack by the opponent.
+        """
+        enemy_color = BLACK if self.whiteToMove else WHITE
+        return self.attackersTo(row * 8 + col, enemy_color, self.occupied) != 0
+
+    def isSquareAttacked(self, square, by_color):
+        return self.attackersTo(BIT_INDEX[square], by_color, self.occupied) != 0
+
+    def inCheck(self):
+        if self.whiteToMove:
+            return self.squareUnderAttack(self.whiteKingLocation[0], self.whiteKingLocation[1])
+        return self.squareUnderAttack(self.blackKingLocation[0], self.blackKingLocation[1])
+
+    def countMoves(self, color):
+        """
+        Pseudo-legal move count from the attack sets: pawn pushes are counted a whole rank at a time and every
+        other piece adds the population count of its targets.
+        """
+        bitboards = self.bitboards
+        occupied = self.occupied
+        own = self.colorBitboards[color]
+        enemies = self.colorBitboards[BLACK if color == WHITE else WHITE]
+        empty = ~occupied & FULL_BOARD
+        pawns = bitboards[color | PAWN]
+        if color == WHITE:  # white pawns move towards row 0, so their square index drops by 8
+            single = (pawns >> 8) & empty
+            double = ((single & RANK_MASKS[5]) >> 8) & empty
+        else:
+            single = (pawns << 8) & empty
+            double = ((single & RANK_MASKS[2]) << 8) & empty
+        count = popCount(single) + popCount(double)
+        pawn_attacks = PAWN_ATTACKS[color]
+        while pawns:
+            low = pawns & -pawns
+            pawns ^= low
+            count += popCount(pawn_attacks[low.bit_length() - 1] & enemies)
+        not_own = ~own
+        for piece_type in (KNIGHT, BISHOP, ROOK, QUEEN, KING):
+            pieces = bitboards[color | piece_type]
+            while pieces:
+                low = pieces & -pieces
+                square = low.bit_length() - 1
+                pieces ^= low
+                if piece_type == KNIGHT:
+                    targets = KNIGHT_ATTACKS[square]
+                elif piece_type == BISHOP:
+                    targets = bishopAttacks(square, occupied)
+                elif piece_type == ROOK:
+                    targets = rookAttacks(square, occupied)
+                elif piece_type == QUEEN:
+                    targets = rookAttacks(square, occupied) | bishopAttacks(square, occupied)
+                else:
+                    targets = KING_ATTACKS[square]
+                count += popCount(targets & not_own)
+        return count
+
+    def _generateStaged(self, context):
+        """
+        The stages of iterMoves straight from the bitboards: captures and promotions, then quiet moves (castling
+        included); when in check, every evasion at once. Pins and checks are resolved with ray masks, so no move
+        is played to test its legality.
+        """
+        if self.in_check:
+            moves = []
+            self.addMoves(context, FULL_BOARD, FULL_BOARD, True, False, moves)
+            yield moves
+            return
+        enemy_color = context[1]
+        enemies = self.colorBitboards[enemy_color]
+        moves = []
+        self.addMoves(context, enemies, enemies | PROMOTION_RANKS, True, False, moves)
+        yield moves
+        # the masks are read once the previous stage's moves have been taken back
+        empty = FULL_BOARD ^ self.occupied
+        moves = []
+        self.addMoves(context, empty, empty & ~PROMOTION_RANKS, False, True, moves)
+        yield moves
+
+    def _generateTactical(self, context):
+        """
+        The legal captures and promotions, or every legal move when in check, from the bitboards.
+        """
+        moves = []
+        if self.in_check:
+            self.addMoves(context, FULL_BOARD, FULL_BOARD, True, False, moves)
+        else:
+            enemies = self.colorBitboards[context[1]]
+            self.addMoves(context, enemies, enemies | PROMOTION_RANKS, True, False, moves)
+        return moves
+
+    def moveContext(self):
+        """
+        Find the checks and pins of the side to move, setting in_check, pins and checks in the mailbox form
+        (pinned square to direction, (square, direction) per checker). Returns what addMoves needs:
+        (ally colour, enemy colour, king square, checkers, target mask, pin masks by square).
+        """
+        if self.whiteToMove:
+            ally_color, enemy_color = WHITE, BLACK
+            king_square = BIT_INDEX[self.whiteKingSquare]
+        else:
+            ally_color, enemy_color = BLACK, WHITE
+            king_square = BIT_INDEX[self.blackKingSquare]
+        bitboards = self.bitboards
+        occupied = self.occupied
+        allies = self.colorBitboards[ally_color]
+
+        checkers = self.attackersTo(king_square, enemy_color, occupied)
+        self.in_check = checkers != 0
+        self.checks = checks = []
+        bits = checkers
+        while bits:
+            low = bits & -bits
+            square = low.bit_length() - 1
+            checks.append((MAILBOX[square], _direction(king_square, square)))
+            bits ^= low
+        if checkers:
+            target_mask = checkers | BETWEEN[king_square][checkers.bit_length() - 1]
+        else:
+            target_mask = FULL_BOARD
+
+        # pinned pieces may only move along the line between the king and the pinner
+        self.pins = pins = {}
+        pin_masks = {}
+        queens = bitboards[enemy_color | QUEEN]
+        snipers = (rookAttacks(king_square, 0) & (bitboards[enemy_color | ROOK] | queens)) | (
+            bishopAttacks(king_square, 0) & (bitboards[enemy_color | BISHOP] | queens)
+        )
+        while snipers:
+            low = snipers & -snipers
+            sniper = low.bit_length() - 1
+            snipers ^= low
+            blockers = BETWEEN[king_square][sniper] & occupied
+            if blockers and blockers & (blockers - 1) == 0 and blockers & allies:
+                pinned_square = blockers.bit_length() - 1
+                pin_masks[pinned_square] = BETWEEN[king_square][sniper] | low
+                pins[MAILBOX[pinned_square]] = _direction(king_square, pinned_square)
+        return ally_color, enemy_color, king_square, checkers, target_mask, pin_masks
+
+    def addMoves(self, context, end_mask, pawn_end_mask, enpassant, castling, moves):
+        """
+        Add the legal moves ending on end_mask (pawn_end_mask for pawns), plus en passant captures and castling
+        if asked for, to moves.
+        """
+        ally_color, enemy_color, king_square, checkers, target_mask, pin_masks = context
+        bitboards = self.bitboards
+        squares = self.squares
+        occupied = self.occupied
+        allies = self.colorBitboards[ally_color]
+        not_allies = ~allies
+
+        # king moves: the king itself must not block the ray it steps back along
+        occupied_without_king = occupied ^ (1 << king_square)
+        targets = KING_ATTACKS[king_square] & not_allies & end_mask
+        base = MAILBOX[king_square] | (ally_color | KING) << MOVE_PIECE_SHIFT
+        while targets:
+            low = targets & -targets
+            end = low.bit_length() - 1
+            targets ^= low
+            if not self.attackersTo(end, enemy_color, occupied_without_king, low):
+                end = MAILBOX[end]
+                moves.append(Move.fromCode(base | end << MOVE_END_SHIFT | squares[end] << MOVE_CAPTURED_SHIFT))
+
+        if checkers & (checkers - 1):  # double check: only the king moves
+            return
+
+        piece_mask = not_allies & target_mask & end_mask
+        for piece_type, attack_function in (
+            (KNIGHT, None), (BISHOP, bishopAttacks), (ROOK, rookAttacks), (QUEEN, None)
+        ):
+            pieces = bitboards[ally_color | piece_type]
+            while pieces:
+                low = pieces & -pieces
+                start = low.bit_length() - 1
+                pieces ^= low
+                if piece_type == KNIGHT:
+                    targets = KNIGHT_ATTACKS[start]
+                elif piece_type == QUEEN:
+                    targets = rookAttacks(start, occupied) | bishopAttacks(start, occupied)
+                else:
+                    targets = attack_function(start, occupied)
+                targets &= piece_mask
+                if start in pin_masks:
+                    targets &= pin_masks[start]
+                base = MAILBOX[start] | (ally_color | piece_type) << MOVE_PIECE_SHIFT
+                while targets:
+                    low = targets & -targets
+                    end = MAILBOX[low.bit_length() - 1]
+                    targets ^= low
+                    moves.append(Move.fromCode(base | end << MOVE_END_SHIFT | squares[end] << MOVE_CAPTURED_SHIFT))
+
+        self.getBitboardPawnMoves(
+            ally_color, enemy_color, king_square, target_mask & pawn_end_mask, pin_masks, enpassant, moves
+        )
+
+        if castling and not checkers:
+            self.getBitboardCastleMoves(ally_color, enemy_color, king_square >> 3, king_square & 7, moves)
+
+    def getBitboardPawnMoves(self, ally_color, enemy_color, king_square, target_mask, pin_masks, enpassant, moves):
+        """
+        Pawn pushes and captures ending on target_mask for the whole pawn set at once using shifted bitboards,
+        and the en passant captures if enpassant is set.
+        """
+        squares = self.squares
+        pawns = self.bitboards[ally_color | PAWN]
+        pawn = (ally_color | PAWN) << MOVE_PIECE_SHIFT
+        empty = FULL_BOARD ^ self.occupied
+        enemies = self.colorBitboards[enemy_color]
+        if ally_color == WHITE:
+            step = -8
+            single = (pawns >> 8) & empty
+            double = ((single & 0x0000FF0000000000) >> 8) & empty
+            # left and right captures, masking pawns that would wrap around the board edge
+            left = ((pawns & 0xFEFEFEFEFEFEFEFE) >> 9) & enemies
+            right = ((pawns & 0x7F7F7F7F7F7F7F7F) >> 7) & enemies
+            left_step, right_step = -9, -7
+        else:
+            step = 8
+            single = ((pawns << 8) & FULL_BOARD) & empty
+            double = ((single & 0x0000000000FF0000) << 8) & empty
+            left = ((pawns & 0xFEFEFEFEFEFEFEFE) << 7) & enemies & FULL_BOARD
+            right = ((pawns & 0x7F7F7F7F7F7F7F7F) << 9) & enemies & FULL_BOARD
+            left_step, right_step = 7, 9
+
+        for targets, delta in ((single, step), (double, 2 * step), (left, left_step), (right, right_step)):
+            targets &= target_mask
+            while targets:
+                low = targets & -targets
+                end = low.bit_length() - 1
+                targets ^= low
+                start = end - delta
+                if start in pin_masks and not (pin_masks[start] & low):
+                    continue
+                end_square = MAILBOX[end]
+                code = MAILBOX[start] | end_square << MOVE_END_SHIFT | pawn | squares[end_square] << MOVE_CAPTURED_SHIFT
+                if end < 8 or end >= 56:
+                    code |= MOVE_PROMOTION
+                moves.append(Move.fromCode(code))
+
+        if enpassant and self.enpassant_square:
+            ep_square = SQUARE_ROWS[self.enpassant_square] * 8 + SQUARE_COLS[self.enpassant_square]
+            captured_bit = 1 << (ep_square - step)
+            attackers = PAWN_ATTACKS[enemy_color][ep_square] & pawns
+            while attackers:
+                low = attackers & -attackers
+                start = low.bit_length() - 1
+                attackers ^= low
+                # play the capture on the occupancy and look for any attack on the king
+                occupied = (self.occupied ^ low ^ captured_bit) | (1 << ep_square)
+                if not self.attackersTo(king_square, enemy_color, occupied, captured_bit):
+                    moves.append(
+                        Move.fromCode(
+                            MAILBOX[start]
+                            | self.enpassant_square << MOVE_END_SHIFT
+                            | pawn
+                            | (enemy_color | PAWN) << MOVE_CAPTURED_SHIFT
+                            | MOVE_ENPASSANT
+                        )
+                    )
+
+    def getBitboardCastleMoves(self, ally_color, enemy_color, row, col, moves):
+        """
+        Castling moves for a king that is not in check.
+        """
+        if ally_color == WHITE:
+            kingside, queenside = self.castling_rights & CASTLE_WKS, self.castling_rights & CASTLE_WQS
+        else:
+            kingside, queenside = self.castling_rights & CASTLE_BKS, self.castling_rights & CASTLE_BQS
+        occupied = self.occupied
+        square = row * 8 + col
+        king = MAILBOX[square] | (ally_color | KING) << MOVE_PIECE_SHIFT | MOVE_CASTLE
+        if kingside and not occupied & ((1 << (square + 1)) | (1 << (square + 2))):
+            if not self.attackersTo(square + 1, enemy_color, occupied) and not self.attackersTo(
+                square + 2, enemy_color, occupied
+            ):
+                moves.append(Move.fromCode(king | MAILBOX[square + 2] << MOVE_END_SHIFT))
+        if queenside and not occupied & ((1 << (square - 1)) | (1 << (square - 2)) | (1 << (square - 3))):
+            if not self.attackersTo(square - 1, enemy_color, occupied) and not self.attackersTo(
+                square - 2, enemy_color, occupied
+            ):
+                moves.append(Move.fromCode(king | MAILBOX[square - 2] << MOVE_END_SHIFT))
@@ -1,245 +1,844 @@
+import random
+import struct
+
+# Piece codes used by the internal board: a colour bit combined with a piece type.
+EMPTY = 0
+PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING = 1, 2, 3, 4, 5, 6
+TYPE_MASK = 7
+WHITE = 8
+BLACK = 16
+OFFBOARD = 32  # sentinel border square, neither colour and never empty
+
+PIECE_NAMES = {EMPTY: "--"}
+for _color, _color_name in ((WHITE, "w"), (BLACK, "b")):
+    for _piece_type, _type_name in ((PAWN, "p"), (KNIGHT, "N"), (BISHOP, "B"), (ROOK, "R"), (QUEEN, "Q"), (KING, "K")):
+        PIECE_NAMES[_color | _piece_type] = _color_name + _type_name
+PIECE_CODES = {name: code for code, name in PIECE_NAMES.items()}
+# FEN letters: upper case for white, lower case for black
+FEN_PIECE_CODES = {
+    (name[1].upper() if code & WHITE else name[1].lower()): code for code, name in PIECE_NAMES.items() if code
+}
+FEN_PIECE_LETTERS = {code: letter for letter, code in FEN_PIECE_CODES.items()}
+
+# The board is a flat 10x12 mailbox: two sentinel rows above and below the 8x8 board and one sentinel column
+# on each side, so a knight jump or a ray step from any real square lands either on the board or on a sentinel.
+SQUARE_ROWS = [-1] * 120
+SQUARE_COLS = [-1] * 120
+BOARD_SQUARES = []
+for _row in range(8):
+    for _col in range(8):
+        _square = (_row + 2) * 10 + _col + 1
+        SQUARE_ROWS[_square] = _row
+        SQUARE_COLS[_square] = _col
+        BOARD_SQUARES.append(_square)
+
+
+def squareIndex(row, col):
+    """
+    Mailbox index of the square at row, col.
+    """
+    return (row + 2) * 10 + col + 1
+
+
+# Mailbox offsets: up, left, down, right, then the diagonals up/left, up/right, down/left, down/right
+UP, DOWN, LEFT, RIGHT = -10, 10, -1, 1
+ORTHOGONAL_DIRECTIONS = (UP, LEFT, DOWN, RIGHT)
+DIAGONAL_DIRECTIONS = (UP + LEFT, UP + RIGHT, DOWN + LEFT, DOWN + RIGHT)
+KNIGHT_OFFSETS = (-21, -19, -8, 12, 19, 21, -12, 8)
+KING_OFFSETS = (UP + LEFT, UP, UP + RIGHT, LEFT, RIGHT, DOWN + LEFT, DOWN, DOWN + RIGHT)
+
+
+def _targetTable(offsets):
+    """
+    For every mailbox square, the on-board squares one step of the offsets away (empty off the board).
+    """
+    return [
+        tuple(square + offset for offset in offsets if SQUARE_ROWS[square + offset] >= 0)
+        if SQUARE_ROWS[square] >= 0 else ()
+        for square in range(120)
+    ]
+
+
+def _rayTable(directions):
+    """
+    For every mailbox square, a (direction, squares) pair per direction listing the squares along it up to
+    the board edge, nearest first. Directions that leave the board at once are left out.
+    """
+    table = []
+    for square in range(120):
+        rays = []
+        if SQUARE_ROWS[square] >= 0:
+            for direction in directions:
+                ray = []
+                end = square + direction
+                while SQUARE_ROWS[end] >= 0:
+                    ray.append(end)
+                    end += direction
+                if ray:
+                    rays.append((direction, tuple(ray)))
+        table.append(tuple(rays))
+    return table
+
+
+# Lookup tables built once at import, indexed by mailbox square, so generators never step onto a sentinel
+KNIGHT_TARGETS = _targetTable(KNIGHT_OFFSETS)
+KING_TARGETS = _targetTable(KING_OFFSETS)
+ORTHOGONAL_RAYS = _rayTable(ORTHOGONAL_DIRECTIONS)
+DIAGONAL_RAYS = _rayTable(DIAGONAL_DIRECTIONS)
+QUEEN_RAYS = [orthogonal + diagonal for orthogonal, diagonal in zip(ORTHOGONAL_RAYS, DIAGONAL_RAYS)]
+SLIDER_RAYS = {BISHOP: DIAGONAL_RAYS, ROOK: ORTHOGONAL_RAYS, QUEEN: QUEEN_RAYS}
+
+# Piece values in pawns for static exchange evaluation, by piece type; losing the king outweighs everything
+EXCHANGE_VALUES = (0, 1, 3, 3, 5, 9, 100, 0)
+
+# Packed move layout: bits 0-6 start square, 7-13 end square, 14-18 moved piece, 19-23 captured piece, then flags
+SQUARE_MASK = 0x7F
+PIECE_FIELD_MASK = 0x1F
+MOVE_END_SHIFT = 7
+MOVE_PIECE_SHIFT = 14
+MOVE_CAPTURED_SHIFT = 19
+MOVE_SQUARES_MASK = (1 << MOVE_PIECE_SHIFT) - 1
+MOVE_ENPASSANT = 1 << 24
+MOVE_CASTLE = 1 << 25
+MOVE_PROMOTION = 1 << 26
+TACTICAL_MOVE_FLAGS = PIECE_FIELD_MASK << MOVE_CAPTURED_SHIFT | MOVE_PROMOTION  # set for captures and promotions
+
+# Castling rights are a 4-bit mask. A move that starts or ends on a king or rook home square loses the rights
+# that depend on that piece, so the new rights are the old ones ANDed with CASTLING_KEEP of both squares.
+CASTLE_WKS, CASTLE_BKS, CASTLE_WQS, CASTLE_BQS = 1, 2, 4, 8
+ALL_CASTLING = CASTLE_WKS | CASTLE_BKS | CASTLE_WQS | CASTLE_BQS
+CASTLING_KEEP = [ALL_CASTLING] * 120
+CASTLING_KEEP[squareIndex(7, 4)] = CASTLE_BKS | CASTLE_BQS
+CASTLING_KEEP[squareIndex(7, 7)] = ALL_CASTLING & ~CASTLE_WKS
+CASTLING_KEEP[squareIndex(7, 0)] = ALL_CASTLING & ~CASTLE_WQS
+CASTLING_KEEP[squareIndex(0, 4)] = CASTLE_WKS | CASTLE_WQS
+CASTLING_KEEP[squareIndex(0, 7)] = ALL_CASTLING & ~CASTLE_BKS
+CASTLING_KEEP[squareIndex(0, 0)] = ALL_CASTLING & ~CASTLE_BQS
+
+# Incremental evaluation: a middlegame and an endgame score per piece code and square (positive for white,
+# negative for black), summed over the board and kept up to date by makeMove/undoMove together with the game
+# phase, which falls from MAX_PHASE with all the pieces on the board towards 0 as they come off.
+# The evaluator fills the score tables in with setEvaluationTables; until then both sums stay 0.
+EVAL_MIDGAME = [[0] * 120 for _ in range((BLACK | KING) + 1)]
+EVAL_ENDGAME = [[0] * 120 for _ in range((BLACK | KING) + 1)]
+PHASE_WEIGHTS = [0] * ((BLACK | KING) + 1)
+for _color in (WHITE, BLACK):
+    PHASE_WEIGHTS[_color | KNIGHT] = PHASE_WEIGHTS[_color | BISHOP] = 1
+    PHASE_WEIGHTS[_color | ROOK] = 2
+    PHASE_WEIGHTS[_color | QUEEN] = 4
+MAX_PHASE = 24
+
+
+def setEvaluationTables(midgame, endgame):
+    """
+    Install the evaluator's score tables: for each piece code, a list of its score on each mailbox square.
+    Game states set up before this need computeEvaluation().
+    """
+    for code in range(len(EVAL_MIDGAME)):
+        EVAL_MIDGAME[code][:] = midgame.get(code, [0] * 120)
+        EVAL_ENDGAME[code][:] = endgame.get(code, [0] * 120)
+
+
+# Undo records are reused lists of [previous en passant square, previous castling mask, previous Zobrist key,
+# previous halfmove clock, previous middlegame score, previous endgame score, previous phase, previous pawn key],
+# one per ply; this many are allocated up front and the stack grows if a game gets longer. The stored keys double as the position
+# history for repetition detection.
+UNDO_STACK_SIZE = 256
+UNDO_KEY = 2
+
+# Snapshot header: flags (bit 0 black to move, bits 1-4 castling rights), en passant square, plies played,
+# halfmove clock and the number of history keys. The 64 piece codes follow in row-major order, then the keys
+# of the positions since the last capture or pawn move (at most HISTORY_LIMIT of them), oldest first.
+SNAPSHOT_HEADER = struct.Struct("<BBHHB")
+SNAPSHOT_KEY = struct.Struct("<Q")
+HISTORY_LIMIT = 100  # the fifty-move rule ends the game before older positions could repeat
+
+# Zobrist keys: one random 64-bit number per (piece, square), side to move, castling right and en passant file.
+# The generator is seeded so every process (and every run) derives the same keys for the same position.
+_zobrist_random = random.Random(20230611)
+ZOBRIST_PIECES = [[_zobrist_random.getrandbits(64) for _ in range(120)] for _ in range((BLACK | KING) + 1)]
+ZOBRIST_BLACK_TO_MOVE = _zobrist_random.getrandbits(64)
+ZOBRIST_CASTLING = [_zobrist_random.getrandbits(64) for _ in range(4)]  # wks, bks, wqs, bqs
+ZOBRIST_CASTLING_MASKS = [0] * (ALL_CASTLING + 1)  # the XOR of the keys of every right in a mask
+for _mask in range(ALL_CASTLING + 1):
+    for _bit in range(4):
+        if _mask & (1 << _bit):
+            ZOBRIST_CASTLING_MASKS[_mask] ^= ZOBRIST_CASTLING[_bit]
+_zobrist_files = [_zobrist_random.getrandbits(64) for _ in range(8)]
+ZOBRIST_ENPASSANT = [_zobrist_files[col] if col >= 0 else 0 for col in SQUARE_COLS]  # square 0 (none) -> 0
+
+INITIAL_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+INITIAL_BOARD = [
+    ["bR", "bN", "bB", "bQ", "bK", "bB", "bN", "bR"],
+    ["bp", "bp", "bp", "bp", "bp", "bp", "bp", "bp"],
+    ["--", "--", "--", "--", "--", "--", "--", "--"],
+    ["--", "--", "--", "--", "--", "--", "--", "--"],
+    ["--", "--", "--", "--", "--", "--", "--", "--"],
+    ["--", "--", "--", "--", "--", "--", "--", "--"],
+    ["wp", "wp", "wp", "wp", "wp", "wp", "wp", "wp"],
+    ["wR", "wN", "wB", "wQ", "wK", "wB", "wN", "wR"],
+]
+
+
 class GameState:
     def __init__(self):
         """
         This is the initialization method for a chess board. It sets up the initial state of the board with the pieces in their starting positions.
         """
-        self.board = [
-            ["bR", "bN", "bB", "bQ", "bK", "bB", "bN", "bR"],
-            ["bp", "bp", "bp", "bp", "bp", "bp", "bp", "bp"],
-            ["--", "--", "--", "--", "--", "--", "--", "--"],
-            ["--", "--", "--", "--", "--", "--", "--", "--"],
-            ["--", "--", "--", "--", "--", "--", "--", "--"],
-            ["--", "--", "--", "--", "--", "--", "--", "--"],
-            ["wp", "wp", "wp", "wp", "wp", "wp", "wp", "wp"],
-            ["wR", "wN", "wB", "wQ", "wK", "wB", "wN", "wR"],
-        ]
-        self.moveFunctions = {
-            "p": self.getPawnMoves,
-            "R": self.getRookMoves,
-            "N": self.getKnightMoves,
-            "B": self.getBishopMoves,
-            "Q": self.getQueenMoves,
-            "K": self.getKingMoves,
-        }
+        self.squares = [OFFBOARD] * 120
+        self.whiteKingSquare = squareIndex(7, 4)
+        self.blackKingSquare = squareIndex(0, 4)
+        self._board = None
+        self._valid_moves = None
         self.whiteToMove = True
         self.moveLog = []
-        self.whiteKingLocation = (7, 4)
-        self.blackKingLocation = (0, 4)
+        self.start_ply = 0  # plies played before the first logged move, for the FEN move number
+        self.halfmove_clock = 0  # plies since the last capture or pawn move
+        self.prior_keys = []  # keys of the positions before the first logged move, oldest first
         self.checkmate = False
         self.stalemate = False
         self.in_check = False
-        self.pins = []
+        self.pins = {}
         self.checks = []
-        self.enpassant_possible = ()
-        self.enpassant_possible_log = [self.enpassant_possible]
-        self.current_castling_rights = CastleRights(True, True, True, True)
-        self.castle_rights_log = [
-            CastleRights(
-                self.current_castling_rights.wks,
-                self.current_castling_rights.bks,
-                self.current_castling_rights.wqs,
-                self.current_castling_rights.bqs,
-            )
+        self.enpassant_square = 0
+        self.castling_rights = ALL_CASTLING
+        self.midgame_score = 0
+        self.endgame_score = 0
+        self.phase = 0
+        self.undo_stack = [[0, 0, 0, 0, 0, 0, 0, 0] for _ in range(UNDO_STACK_SIZE)]
+        self.board = INITIAL_BOARD
+
+    @property
+    def board(self):
+        """
+        The position as an 8x8 list of two-character piece names ("wK", "bp", "--"), as used by the renderer.
+        It is rebuilt from the mailbox only when a move has changed the position since it was last read.
+        """
+        if self._board is None:
+            names = PIECE_NAMES
+            squares = self.squares
+            self._board = [
+                [names[squares[square]] for square in range(start, start + 8)] for start in range(21, 101, 10)
+            ]
+        return self._board
+
+    @board.setter
+    def board(self, board):
+        """
+        Load the mailbox from an 8x8 list of piece names.
+        """
+        for row in range(8):
+            for col in range(8):
+                piece = PIECE_CODES[board[row][col]]
+                self.squares[squareIndex(row, col)] = piece
+                if piece == WHITE | KING:
+                    self.whiteKingSquare = squareIndex(row, col)
+                elif piece == BLACK | KING:
+                    self.blackKingSquare = squareIndex(row, col)
+        self._board = None
+        self._valid_moves = None
+        self.zobrist_key = self.computeZobristKey()
+        self.pawn_key = self.computePawnKey()
+        self.computeEvaluation()
+
+    def snapshot(self):
+        """
+        The position as a compact byte string for handing to another process: side to move, castling rights,
+        en passant square, the move number, the halfmove clock, the 64 squares and the keys repetition detection
+        needs. The move log is left behind.
+        """
+        flags = (0 if self.whiteToMove else 1) | self.castling_rights << 1
+        keys = self.historyKeys()
+        header = SNAPSHOT_HEADER.pack(
+            flags, self.enpassant_square, self.start_ply + len(self.moveLog), self.halfmove_clock, len(keys)
+        )
+        squares = self.squares
+        return (
+            header
+            + bytes([squares[square] for square in BOARD_SQUARES])
+            + b"".join([SNAPSHOT_KEY.pack(key) for key in keys])
+        )
+
+    def restore(self, data):
+        """
+        Set up the position from a snapshot() byte string, clearing the move history.
+        """
+        flags, self.enpassant_square, self.start_ply, self.halfmove_clock, key_count = SNAPSHOT_HEADER.unpack_from(data)
+        keys_start = SNAPSHOT_HEADER.size + 64
+        self.prior_keys = [
+            SNAPSHOT_KEY.unpack_from(data, keys_start + index * SNAPSHOT_KEY.size)[0] for index in range(key_count)
         ]
+        squares = self.squares
+        for square, piece in zip(BOARD_SQUARES, data[SNAPSHOT_HEADER.size:keys_start]):
+            squares[square] = piece
+            if piece == WHITE | KING:
+                self.whiteKingSquare = square
+            elif piece == BLACK | KING:
+                self.blackKingSquare = square
+        self.whiteToMove = not flags & 1
+        self.castling_rights = flags >> 1
+        self.moveLog = []
+        self.checkmate = False
+        self.stalemate = False
+        self.in_check = False
+        self.pins = {}
+        self.checks = []
+        self._board = None
+        self._valid_moves = None
+        self.zobrist_key = self.computeZobristKey()
+        self.pawn_key = self.computePawnKey()
+        self.computeEvaluation()
+
+    def __getstate__(self):
+        # pickling (a Process argument, a Pool task, deepcopy) carries only the snapshot, not the move log
+        # or the undo stack
+        return self.snapshot()
+
+    def __setstate__(self, state):
+        self.__init__()
+        self.restore(state)
+
+    def loadFEN(self, fen):
+        """
+        Set up the position described by a FEN string, clearing the move history.
+        Raises ValueError for a malformed string.
+        """
+        fields = fen.split()
+        if not 4 <= len(fields) <= 6 or fields[1] not in ("w", "b"):
+            raise ValueError(f"Invalid FEN: {fen!r}")
+        placement, side, castling, enpassant = fields[:4]
+        board = []
+        for rank in placement.split("/"):
+            row = []
+            for char in rank:
+                if char.isdigit():
+                    row.extend(["--"] * int(char))
+                elif char in FEN_PIECE_CODES:
+                    row.append(PIECE_NAMES[FEN_PIECE_CODES[char]])
+                else:
+                    raise ValueError(f"Invalid FEN piece {char!r}: {fen!r}")
+            if len(row) != 8:
+                raise ValueError(f"Invalid FEN rank {rank!r}: {fen!r}")
+            board.append(row)
+        if len(board) != 8:
+            raise ValueError(f"Invalid FEN: {fen!r}")
+        if placement.count("K") != 1 or placement.count("k") != 1:
+            raise ValueError(f"Invalid FEN, each side needs exactly one king: {fen!r}")
+        try:
+            halfmove = int(fields[4]) if len(fields) > 4 else 0
+            fullmove = int(fields[5]) if len(fields) > 5 else 1
+            enpassant_square = (
+                0 if enpassant == "-"
+                else squareIndex(Move.ranks_to_rows[enpassant[1]], Move.files_to_cols[enpassant[0]])
+            )
+        except (ValueError, KeyError, IndexError):
+            raise ValueError(f"Invalid FEN: {fen!r}") from None
+        if halfmove < 0 or fullmove < 1:
+            raise ValueError(f"Invalid FEN move counters: {fen!r}")
+        if castling != "-" and not set(castling) <= set("KQkq"):
+            raise ValueError(f"Invalid FEN castling rights {castling!r}: {fen!r}")
+        # a right is only kept while its king and rook are still on their home squares
+        castling_rights = 0
+        for letter, right, row, rook_col in (
+            ("K", CASTLE_WKS, 7, 7), ("k", CASTLE_BKS, 0, 7), ("Q", CASTLE_WQS, 7, 0), ("q", CASTLE_BQS, 0, 0)
+        ):
+            color = "w" if letter.isupper() else "b"
+            if letter in castling and board[row][4] == color + "K" and board[row][rook_col] == color + "R":
+                castling_rights |= right
+
+        self.whiteToMove = side == "w"
+        self.enpassant_square = enpassant_square
+        self.moveLog = []
+        self.start_ply = 2 * (fullmove - 1) + (0 if self.whiteToMove else 1)
+        self.halfmove_clock = halfmove
+        self.prior_keys = []
+        self.checkmate = False
+        self.stalemate = False
+        self.in_check = False
+        self.pins = {}
+        self.checks = []
+        self.castling_rights = castling_rights
+        self.board = board  # loads the mailbox and recomputes the key with the state above
+
+    def getFEN(self):
+        """
+        The FEN string of the current position.
+        """
+        squares = self.squares
+        ranks = []
+        for start in range(21, 101, 10):
+            rank = ""
+            empty = 0
+            for square in range(start, start + 8):
+                piece = squares[square]
+                if piece == EMPTY:
+                    empty += 1
+                else:
+                    if empty:
+                        rank += str(empty)
+                        empty = 0
+                    rank += FEN_PIECE_LETTERS[piece]
+            if empty:
+                rank += str(empty)
+            ranks.append(rank)
+        castling = "".join(
+            letter
+            for right, letter in ((CASTLE_WKS, "K"), (CASTLE_WQS, "Q"), (CASTLE_BKS, "k"), (CASTLE_BQS, "q"))
+            if self.castling_rights & right
+        )
+        if self.enpassant_square:
+            enpassant = (
+                Move.cols_to_files[SQUARE_COLS[self.enpassant_square]]
+                + Move.rows_to_ranks[SQUARE_ROWS[self.enpassant_square]]
+            )
+        else:
+            enpassant = "-"
+        fullmove = (self.start_ply + len(self.moveLog)) // 2 + 1
+        return " ".join(
+            ("/".join(ranks), "w" if self.whiteToMove else "b", castling or "-", enpassant, str(self.halfmove_clock), str(fullmove))
+        )
+
+    def computeZobristKey(self):
+        """
+        Compute the Zobrist key of the current position from scratch.
+        makeMove and undoMove keep zobrist_key up to date incrementally; this is the reference it must match.
+        """
+        key = 0
+        for square in BOARD_SQUARES:
+            piece = self.squares[square]
+            if piece != EMPTY:
+                key ^= ZOBRIST_PIECES[piece][square]
+        if not self.whiteToMove:
+            key ^= ZOBRIST_BLACK_TO_MOVE
+        return key ^ ZOBRIST_CASTLING_MASKS[self.castling_rights] ^ ZOBRIST_ENPASSANT[self.enpassant_square]
+
+    def computePawnKey(self):
+        """
+        Compute the pawn key from scratch: the XOR of the Zobrist keys of the pawns alone, so positions with the
+        same pawns share it whatever the other pieces do. makeMove and undoMove keep pawn_key up to date.
+        """
+        key = 0
+        for square in BOARD_SQUARES:
+            piece = self.squares[square]
+            if piece & TYPE_MASK == PAWN:
+                key ^= ZOBRIST_PIECES[piece][square]
+        return key
+
+    def computeEvaluation(self):
+        """
+        Sum the middlegame and endgame scores and the game phase over the board from scratch.
+        """
+        midgame = endgame = phase = 0
+        squares = self.squares
+        for square in BOARD_SQUARES:
+            piece = squares[square]
+            if piece != EMPTY:
+                midgame += EVAL_MIDGAME[piece][square]
+                endgame += EVAL_ENDGAME[piece][square]
+                phase += PHASE_WEIGHTS[piece]
+        self.midgame_score, self.endgame_score, self.phase = midgame, endgame, phase
+
+    @staticmethod
+    def zobristMoveKey(code):
+        """
+        The XOR of the piece/square keys a packed move toggles: the moved piece on both squares (a queen on the
+        end square for a promotion), the captured piece and the rook of a castle.
+        Playing or taking back the move applies it.
+        """
+        start = code & SQUARE_MASK
+        end = (code >> MOVE_END_SHIFT) & SQUARE_MASK
+        piece = (code >> MOVE_PIECE_SHIFT) & PIECE_FIELD_MASK
+        captured = (code >> MOVE_CAPTURED_SHIFT) & PIECE_FIELD_MASK
+        placed = (piece & ~TYPE_MASK) | QUEEN if code & MOVE_PROMOTION else piece
+        key = ZOBRIST_PIECES[piece][start] ^ ZOBRIST_PIECES[placed][end]
+        if captured != EMPTY:
+            if code & MOVE_ENPASSANT:
+                key ^= ZOBRIST_PIECES[captured][start - SQUARE_COLS[start] + SQUARE_COLS[end]]
+            else:
+                key ^= ZOBRIST_PIECES[captured][end]
+        if code & MOVE_CASTLE:
+            rook = (piece & ~TYPE_MASK) | ROOK
+            if end - start == 2:
+                key ^= ZOBRIST_PIECES[rook][end + 1] ^ ZOBRIST_PIECES[rook][end - 1]
+            else:
+                key ^= ZOBRIST_PIECES[rook][end - 2] ^ ZOBRIST_PIECES[rook][end + 1]
+        return key
+
+    @property
+    def whiteKingLocation(self):
+        return SQUARE_ROWS[self.whiteKingSquare], SQUARE_COLS[self.whiteKingSquare]
+
+    @property
+    def blackKingLocation(self):
+        return SQUARE_ROWS[self.blackKingSquare], SQUARE_COLS[self.blackKingSquare]
+
+    @property
+    def current_castling_rights(self):
+        """
+        The castling rights as a CastleRights object. It is a copy: assign a new one to change the rights.
+        """
+        rights = self.castling_rights
+        return CastleRights(
+            bool(rights & CASTLE_WKS), bool(rights & CASTLE_BKS), bool(rights & CASTLE_WQS), bool(rights & CASTLE_BQS)
+        )
+
+    @current_castling_rights.setter
+    def current_castling_rights(self, rights):
+        self.castling_rights = (
+            (CASTLE_WKS if rights.wks else 0)
+            | (CASTLE_BKS if rights.bks else 0)
+            | (CASTLE_WQS if rights.wqs else 0)
+            | (CASTLE_BQS if rights.bqs else 0)
+        )
+        self.zobrist_key = self.computeZobristKey()
+        self._valid_moves = None
+
+    @property
+    def enpassant_possible(self):
+        """
+        The (row, col) a pawn can capture en passant on, or () when there is none.
+        """
+        if self.enpassant_square:
+            return SQUARE_ROWS[self.enpassant_square], SQUARE_COLS[self.enpassant_square]
+        return ()
+
+    def historyKeys(self):
+        """
+        Keys of the earlier positions that could still repeat: those since the last capture or pawn move,
+        at most HISTORY_LIMIT of them, oldest first.
+        """
+        ply = len(self.moveLog)
+        count = min(self.halfmove_clock, HISTORY_LIMIT, ply + len(self.prior_keys))
+        undo_stack = self.undo_stack
+        keys = []
+        for index in range(ply - count, ply):
+            keys.append(undo_stack[index][UNDO_KEY] if index >= 0 else self.prior_keys[index])
+        return keys
+
+    def isRepetition(self):
+        """
+        True if the current position has occurred before since the last capture or pawn move.
+        Only every second ply can hold the same position, since the side to move must match.
+        """
+        key = self.zobrist_key
+        ply = len(self.moveLog)
+        stop = max(ply - self.halfmove_clock, -len(self.prior_keys))
+        index = ply - 4  # a position can't repeat within four plies
+        while index >= stop:
+            if (self.undo_stack[index][UNDO_KEY] if index >= 0 else self.prior_keys[index]) == key:
+                return True
+            index -= 2
+        return False
+
+    def insufficientMaterial(self):
+        """
+        True if neither side can possibly checkmate: kings alone, a single minor piece, or only bishops that all
+        stand on squares of one colour.
+        """
+        knights = bishops = 0
+        bishop_colors = set()
+        squares = self.squares
+        for square in BOARD_SQUARES:
+            piece_type = squares[square] & TYPE_MASK
+            if piece_type == KNIGHT:
+                knights += 1
+            elif piece_type == BISHOP:
+                bishops += 1
+                bishop_colors.add((SQUARE_ROWS[square] + SQUARE_COLS[square]) & 1)
+            elif piece_type != EMPTY and piece_type != KING:
+                return False  # a pawn, rook or queen
+        return knights + bishops <= 1 or (knights == 0 and len(bishop_colors) == 1)
+
+    def hasPieces(self, color):
+        """
+        True if color has a knight, bishop, rook or queen on the board, rather than only king and pawns.
+        """
+        for piece in self.squares:
+            if piece & color and piece & TYPE_MASK not in (PAWN, KING):
+                return True
+        return False
+
+    def isDraw(self):
+        """
+        True if the position is drawn by repetition, the fifty-move rule or insufficient material.
+        """
+        return self.halfmove_clock >= 100 or self.isRepetition() or self.insufficientMaterial()
 
     def makeMove(self, move):
         """
         Update the chess board after a move is made.
+        Returns the move's undo record, which can be handed back to undoMove.
         """
-
-        self.board[move.startRow][move.startCol] = "--"
-        self.board[move.endRow][move.endCol] = move.pieceMoved
+        code = move.code
+        ply = len(self.moveLog)
+        if ply == len(self.undo_stack):
+            self.undo_stack.append([0, 0, 0, 0, 0, 0, 0, 0])
+        record = self.undo_stack[ply]
+        record[0] = self.enpassant_square
+        record[1] = castling_rights = self.castling_rights
+        record[2] = key = self.zobrist_key
+        record[3] = self.halfmove_clock
+        record[4] = midgame = self.midgame_score
+        record[5] = endgame = self.endgame_score
+        record[6] = phase = self.phase
+        record[7] = self.pawn_key
+        # take the old castling rights and en passant square out of the key, the new ones go in at the end
+        key ^= self.zobristMoveKey(code) ^ ZOBRIST_CASTLING_MASKS[castling_rights] ^ ZOBRIST_ENPASSANT[record[0]]
+        squares = self.squares
+        start = code & SQUARE_MASK
+        end = (code >> MOVE_END_SHIFT) & SQUARE_MASK
+        piece = (code >> MOVE_PIECE_SHIFT) & PIECE_FIELD_MASK
+        squares[start] = EMPTY
+        squares[end] = piece
+        self._board = None
+        self._valid_moves = None
         self.moveLog.append(move)
         self.whiteToMove = not self.whiteToMove
-        if move.pieceMoved == "wK":
-            self.whiteKingLocation = (move.endRow, move.endCol)
-        elif move.pieceMoved == "bK":
-            self.blackKingLocation = (move.endRow, move.endCol)
+        if piece == WHITE | KING:
+            self.whiteKingSquare = end
+        elif piece == BLACK | KING:
+            self.blackKingSquare = end
 
-        if move.is_pawn_promotion:
-            self.board[move.endRow][move.endCol] = move.pieceMoved[0] + "Q"
+        # the evaluation loses the moved piece from its start square and any captured piece, and gains the
+        # moved piece (a queen for a promotion) on the end square
+        placed = piece
+        if code & MOVE_PROMOTION:
+            squares[end] = placed = (piece & ~TYPE_MASK) | QUEEN
+        captured = (code >> MOVE_CAPTURED_SHIFT) & PIECE_FIELD_MASK
+        captured_square = end
 
-        if move.is_enpassant_move:
-            self.board[move.startRow][move.endCol] = "--"
+        if code & MOVE_ENPASSANT:
+            captured_square = start - SQUARE_COLS[start] + SQUARE_COLS[end]
+            squares[captured_square] = EMPTY
 
-        if move.pieceMoved[1] == "p" and abs(move.startRow - move.endRow) == 2:
-            self.enpassant_possible = (
-                (move.startRow + move.endRow) // 2,
-                move.startCol,
-            )
+        self.midgame_score = (
+            midgame + EVAL_MIDGAME[placed][end] - EVAL_MIDGAME[piece][start] - EVAL_MIDGAME[captured][captured_square]
+        )
+        self.endgame_score = (
+            endgame + EVAL_ENDGAME[placed][end] - EVAL_ENDGAME[piece][start] - EVAL_ENDGAME[captured][captured_square]
+        )
+        self.phase = phase + PHASE_WEIGHTS[placed] - PHASE_WEIGHTS[piece] - PHASE_WEIGHTS[captured]
+
+        # the pawn key changes only when a pawn moves (or promotes) or is captured
+        if piece & TYPE_MASK == PAWN:
+            self.pawn_key ^= ZOBRIST_PIECES[piece][start]
+            if placed == piece:
+                self.pawn_key ^= ZOBRIST_PIECES[piece][end]
+        if captured & TYPE_MASK == PAWN:
+            self.pawn_key ^= ZOBRIST_PIECES[captured][captured_square]
+
+        if piece & TYPE_MASK == PAWN and abs(end - start) == 20:
+            self.enpassant_square = (start + end) // 2
+        else:
+            self.enpassant_square = 0
+
+        if piece & TYPE_MASK == PAWN or code & (PIECE_FIELD_MASK << MOVE_CAPTURED_SHIFT):
+            self.halfmove_clock = 0
         else:
-            self.enpassant_possible = ()
-
-        if move.is_castle_move:
-            if move.endCol - move.startCol == 2:
-                self.board[move.endRow][move.endCol - 1] = self.board[move.endRow][
-                    move.endCol + 1
-                ]
-                self.board[move.endRow][move.endCol + 1] = "--"
+            self.halfmove_clock += 1
+
+        if code & MOVE_CASTLE:
+            rook = (piece & ~TYPE_MASK) | ROOK
+            if end - start == 2:
+                rook_start, rook_end = end + 1, end - 1
             else:
-                self.board[move.endRow][move.endCol + 1] = self.board[move.endRow][
-                    move.endCol - 2
-                ]
-                self.board[move.endRow][move.endCol - 2] = "--"  
-
-        self.enpassant_possible_log.append(self.enpassant_possible)
-
-        self.updateCastleRights(move)
-        self.castle_rights_log.append(
-            CastleRights(
-                self.current_castling_rights.wks,
-                self.current_castling_rights.bks,
-                self.current_castling_rights.wqs,
-                self.current_castling_rights.bqs,
-            )
+                rook_start, rook_end = end - 2, end + 1
+            squares[rook_end] = rook
+            squares[rook_start] = EMPTY
+            self.midgame_score += EVAL_MIDGAME[rook][rook_end] - EVAL_MIDGAME[rook][rook_start]
+            self.endgame_score += EVAL_ENDGAME[rook][rook_end] - EVAL_ENDGAME[rook][rook_start]
+
+        # moving a king or rook off its home square, or capturing a rook on it, loses those rights
+        self.castling_rights = castling_rights = castling_rights & CASTLING_KEEP[start] & CASTLING_KEEP[end]
+        self.zobrist_key = (
+            key
+            ^ ZOBRIST_BLACK_TO_MOVE
+            ^ ZOBRIST_CASTLING_MASKS[castling_rights]
+            ^ ZOBRIST_ENPASSANT[self.enpassant_square]
         )
+        return record
 
-    def undoMove(self):
+    def makeNullMove(self):
+        """
+        Pass the turn without moving, for the search's null-move pruning. The pass isn't logged, and the halfmove
+        clock restarts so repetition detection doesn't look back past it.
+        Returns the record undoNullMove needs.
+        """
+        token = (self.enpassant_square, self.zobrist_key, self.halfmove_clock)
+        self.zobrist_key ^= ZOBRIST_BLACK_TO_MOVE ^ ZOBRIST_ENPASSANT[self.enpassant_square]
+        self.enpassant_square = 0
+        self.halfmove_clock = 0
+        self.whiteToMove = not self.whiteToMove
+        self._valid_moves = None
+        return token
+
+    def undoNullMove(self, token):
+        self.enpassant_square, self.zobrist_key, self.halfmove_clock = token
+        self.whiteToMove = not self.whiteToMove
+        self._valid_moves = None
+        self.checkmate = False
+        self.stalemate = False
+
+    def undoMove(self, token=None):
         """
         Undo the last move made in the chess game.
+        token is the record makeMove returned for that move; without it the record is looked up on the stack.
         """
         if len(self.moveLog) != 0:
-            move = self.moveLog.pop()
-            self.board[move.startRow][move.startCol] = move.pieceMoved
-            self.board[move.endRow][move.endCol] = move.pieceCaptured
-            self.whiteToMove = not self.whiteToMove 
-            if move.pieceMoved == "wK":
-                self.whiteKingLocation = (move.startRow, move.startCol)
-            elif move.pieceMoved == "bK":
-                self.blackKingLocation = (move.startRow, move.startCol)
-                
+            code = self.moveLog.pop().code
+            if token is None:
+                token = self.undo_stack[len(self.moveLog)]
+            (self.enpassant_square, self.castling_rights, self.zobrist_key, self.halfmove_clock,
+             self.midgame_score, self.endgame_score, self.phase, self.pawn_key) = token
+            squares = self.squares
+            start = code & SQUARE_MASK
+            end = (code >> MOVE_END_SHIFT) & SQUARE_MASK
+            piece = (code >> MOVE_PIECE_SHIFT) & PIECE_FIELD_MASK
+            captured = (code >> MOVE_CAPTURED_SHIFT) & PIECE_FIELD_MASK
+            squares[start] = piece
+            squares[end] = captured
+            self._board = None
+            self._valid_moves = None
+            self.whiteToMove = not self.whiteToMove
+            if piece == WHITE | KING:
+                self.whiteKingSquare = start
+            elif piece == BLACK | KING:
+                self.blackKingSquare = start
+
             # Special case for en passant
-            if move.is_enpassant_move:
+            if code & MOVE_ENPASSANT:
                 # Clear the landing square
-                self.board[move.endRow][move.endCol] = "--" 
+                squares[end] = EMPTY
                 # Restore the captured pawn
-                self.board[move.startRow][move.endCol] = move.pieceCaptured
-
-            # Restore en passant possibility
-            self.enpassant_possible_log.pop()
-            self.enpassant_possible = self.enpassant_possible_log[-1]
+                squares[start - SQUARE_COLS[start] + SQUARE_COLS[end]] = captured
 
-            # Restore castling rights
-            self.castle_rights_log.pop()
-            self.current_castling_rights = self.castle_rights_log[-1]
-            
             # Special case for castling
-            if move.is_castle_move:
-                if move.endCol - move.startCol == 2:  # Kingside castle
+            if code & MOVE_CASTLE:
+                if end - start == 2:  # Kingside castle
                     # Move rook back to original position
-                    self.board[move.endRow][move.endCol + 1] = self.board[move.endRow][move.endCol - 1]
-                    self.board[move.endRow][move.endCol - 1] = "--"
+                    squares[end + 1] = squares[end - 1]
+                    squares[end - 1] = EMPTY
                 else:  # Queenside castle
                     # Move rook back to original position
-                    self.board[move.endRow][move.endCol - 2] = self.board[move.endRow][move.endCol + 1]
-                    self.board[move.endRow][move.endCol + 1] = "--"
-                    
+                    squares[end - 2] = squares[end + 1]
+                    squares[end + 1] = EMPTY
+
             # Reset checkmate and stalemate flags
             self.checkmate = False
             self.stalemate = False
 
-    def updateCastleRights(self, move):
-        """
-        Update the castle rights based on the given move.
-        """
-
-        if move.pieceCaptured == "wR":
-            if move.endCol == 0:  
-                self.current_castling_rights.wqs = False
-            elif move.endCol == 7:  
-                self.current_castling_rights.wks = False
-        elif move.pieceCaptured == "bR":
-            if move.endCol == 0: 
-                self.current_castling_rights.bqs = False
-            elif move.endCol == 7:
-                self.current_castling_rights.bks = False
-
-        if move.pieceMoved == "wK":
-            self.current_castling_rights.wqs = False
-            self.current_castling_rights.wks = False
-        elif move.pieceMoved == "bK":
-            self.current_castling_rights.bqs = False
-            self.current_castling_rights.bks = False
-        elif move.pieceMoved == "wR":
-            if move.startRow == 7:
-                if move.startCol == 0: 
-                    self.current_castling_rights.wqs = False
-                elif move.startCol == 7: 
-                    self.current_castling_rights.wks = False
-        elif move.pieceMoved == "bR":
-            if move.startRow == 0:
-                if move.startCol == 0: 
-                    self.current_castling_rights.bqs = False
-                elif move.startCol == 7:  
-                    self.current_castling_rights.bks = False
-
     def getValidMoves(self):
         """
         Get all the valid moves for the current player in the chess game.
+        The list and the check, pin, checkmate and stalemate state found with it are kept until the next
+        makeMove or undoMove, so asking again for the same position (the UI each frame, the evaluator at a
+        search leaf) costs a copy of the list.
         return A list of valid moves
         """
+        if self._valid_moves is None:
+            moves = self.generateValidMoves()
+            self._valid_moves = (moves, self.in_check, self.pins, self.checks, self.checkmate, self.stalemate)
+        else:
+            moves, self.in_check, self.pins, self.checks, self.checkmate, self.stalemate = self._valid_moves
+        return list(moves)
 
-        temp_castle_rights = CastleRights(
-            self.current_castling_rights.wks,
-            self.current_castling_rights.bks,
-            self.current_castling_rights.wqs,
-            self.current_castling_rights.bqs,
-        )
-        moves = []
-        self.in_check, self.pins, self.checks = self.checkForPinsAndChecks()
+    def generateValidMoves(self):
+        """
+        Generate the valid moves of the current position, setting in_check, pins, checks, checkmate
+        and stalemate along the way.
+        """
+        return list(self.iterMoves())
 
+    def iterMoves(self):
+        """
+        Yield the valid moves for the current player in stages: captures, then promotions, then quiet moves
+        (castling included). A stage is only generated once the caller asks for its first move, so a search
+        that cuts off on an early capture never builds the quiet moves.
+        The caller may make and undo each move before asking for the next one. Once the moves run out,
+        checkmate and stalemate are set as getValidMoves always did.
+        """
+        for moves in self.iterMoveStages():
+            yield from moves
+
+    def iterMoveStages(self):
+        """
+        The stages of iterMoves as lists, for a caller that orders each stage before searching it. Every list
+        yielded is non-empty and must not be modified; the next one is generated when it is asked for.
+        """
+        cache = self._valid_moves
+        if cache is not None:
+            if cache[0]:
+                yield cache[0]
+            # the caller's searching may have overwritten the state, so put it back like the generating path does
+            _, self.in_check, self.pins, self.checks, self.checkmate, self.stalemate = cache
+            return
+        context = self.moveContext()
+        in_check, pins, checks = self.in_check, self.pins, self.checks
+        found = False
+        for moves in self._generateStaged(context):
+            if moves:
+                found = True
+                yield moves
+            # searching this stage's moves leaves the child positions' checks and pins behind
+            self.in_check, self.pins, self.checks = in_check, pins, checks
+        self.checkmate = not found and in_check
+        self.stalemate = not found and not in_check
+
+    def getTacticalMoves(self):
+        """
+        The valid captures and promotions for the current player, or every valid move when in check, for a
+        quiescence search. Sets in_check, pins and checks, but not checkmate or stalemate, which would need the
+        quiet moves as well.
+        """
+        cache = self._valid_moves
+        if cache is not None:
+            moves, self.in_check, self.pins, self.checks = cache[:4]
+            if self.in_check:
+                return list(moves)
+            return [move for move in moves if move.code & TACTICAL_MOVE_FLAGS]
+        return self._generateTactical(self.moveContext())
+
+    def moveContext(self):
+        """
+        Find the checks and pins of the side to move, setting in_check, pins and checks.
+        Returns what the generation hooks need: (ally colour, king square).
+        """
+        self.in_check, self.pins, self.checks = self.checkForPinsAndChecks()
         if self.whiteToMove:
-            king_row = self.whiteKingLocation[0]
-            king_col = self.whiteKingLocation[1]
-        else:
-            king_row = self.blackKingLocation[0]
-            king_col = self.blackKingLocation[1]
+            return WHITE, self.whiteKingSquare
+        return BLACK, self.blackKingSquare
+
+    def _generateStaged(self, context):
+        """
+        Yield the moves of each stage of iterMoves as a list, generating a stage only when it is asked for:
+        every evasion at once when in check, otherwise captures, promotions and quiet moves.
+        """
+        ally_color, king_square = context
         if self.in_check:
-            if len(self.checks) == 1:  
-                moves = self.getAllPossibleMoves()
-                check = self.checks[0]
-                check_row = check[0]
-                check_col = check[1]
-                piece_checking = self.board[check_row][check_col]
-                valid_squares = []
-                if piece_checking[1] == "N":
-                    valid_squares = [(check_row, check_col)]
-                else:
-                    for i in range(1, 8):
-                        valid_square = (
-                            king_row + check[2] * i,
-                            king_col + check[3] * i,
-                        )
-                        valid_squares.append(valid_square)
-                        if (valid_square[0] == check_row and valid_square[1] == check_col):  
-                            break
-                for i in range(len(moves) - 1, -1, -1):
-                    if (moves[i].pieceMoved[1] != "K"): 
-                        if (not (moves[i].endRow, moves[i].endCol) in valid_squares):
-                            moves.remove(moves[i])
-            else:  
-                self.getKingMoves(king_row, king_col, moves)
-        else:  
-            moves = self.getAllPossibleMoves()
-            if self.whiteToMove:
-                self.getCastleMoves(
-                    self.whiteKingLocation[0], self.whiteKingLocation[1], moves
-                )
-            else:
-                self.getCastleMoves(
-                    self.blackKingLocation[0], self.blackKingLocation[1], moves
-                )
+            moves = []
+            self.getCheckEvasions(king_square, moves)
+            yield moves
+            return
+        squares = self.squares
+        ally_squares = [square for square in BOARD_SQUARES if squares[square] & ally_color]
+        for stage in (self.getCaptureMoves, self.getPromotionMoves, self.getQuietMoves):
+            moves = []
+            stage(ally_squares, moves)
+            yield moves
 
-        if len(moves) == 0:
-            if self.inCheck():
-                self.checkmate = True
-            else:
-                self.stalemate = True
+    def _generateTactical(self, context):
+        """
+        The moves of getTacticalMoves: every evasion when in check, otherwise the captures and promotions.
+        """
+        ally_color, king_square = context
+        moves = []
+        if self.in_check:
+            self.getCheckEvasions(king_square, moves)
         else:
-            self.checkmate = False
-            self.stalemate = False
-
-        self.current_castling_rights = temp_castle_rights
+            squares = self.squares
+            ally_squares = [square for square in BOARD_SQUARES if squares[square] & ally_color]
+            self.getCaptureMoves(ally_squares, moves)
+            self.getPromotionMoves(ally_squares, moves)
         return moves
 
     def inCheck(self):
@@ -249,13 +848,9 @@ class GameState:
         """
 
         if self.whiteToMove:
-            return self.squareUnderAttack(
-                self.whiteKingLocation[0], self.whiteKingLocation[1]
-            )
+            return self.isSquareAttacked(self.whiteKingSquare, BLACK)
         else:
-            return self.squareUnderAttack(
-                self.blackKingLocation[0], self.blackKingLocation[1]
-            )
+            return self.isSquareAttacked(self.blackKingSquare, WHITE)
 
     def squareUnderAttack(self, row, col):
         """
@@ -263,441 +858,498 @@ class GameState:
         return True if the square is under attack, False otherwise
         """
 
-        self.whiteToMove = not self.whiteToMove 
-        opponents_moves = self.getAllPossibleMoves()
-        self.whiteToMove = not self.whiteToMove
-        for move in opponents_moves:
-            if move.endRow == row and move.endCol == col:  
+        return self.isSquareAttacked(squareIndex(row, col), BLACK if self.whiteToMove else WHITE)
+
+    def isSquareAttacked(self, square, by_color):
+        """
+        Check if any piece of by_color attacks the mailbox square.
+        Looks outward from the square: pawn diagonals, knight jumps and king steps, then along every ray
+        to the first piece, so no move list is generated.
+        """
+        squares = self.squares
+        if by_color == WHITE:  # white pawns attack upwards, so they sit below the square
+            if squares[square + DOWN + LEFT] == WHITE | PAWN or squares[square + DOWN + RIGHT] == WHITE | PAWN:
                 return True
+        elif squares[square + UP + LEFT] == BLACK | PAWN or squares[square + UP + RIGHT] == BLACK | PAWN:
+            return True
+        knight = by_color | KNIGHT
+        for end in KNIGHT_TARGETS[square]:
+            if squares[end] == knight:
+                return True
+        king = by_color | KING
+        for end in KING_TARGETS[square]:
+            if squares[end] == king:
+                return True
+        queen = by_color | QUEEN
+        for slider, rays in ((by_color | ROOK, ORTHOGONAL_RAYS[square]), (by_color | BISHOP, DIAGONAL_RAYS[square])):
+            for _, ray in rays:
+                for end in ray:
+                    piece = squares[end]
+                    if piece != EMPTY:
+                        if piece == slider or piece == queen:
+                            return True
+                        break
         return False
 
-    def getAllPossibleMoves(self):
+    def leastValuableAttacker(self, square, by_color):
         """
-        Get all possible moves for the current player in the chess game.
-        return A list of all possible moves
+        The square of the cheapest piece of by_color attacking the mailbox square, or 0 if there is none.
+        Pins are ignored.
         """
-        moves = []
-        for row in range(len(self.board)):
-            for col in range(len(self.board[row])):
-                turn = self.board[row][col][0]
-                if (turn == "w" and self.whiteToMove) or (
-                    turn == "b" and not self.whiteToMove
-                ):
-                    piece = self.board[row][col][1]
-                    self.moveFunctions[piece](
-                        row, col, moves
-                    )  
-        return moves
+        squares = self.squares
+        pawn = by_color | PAWN
+        behind = DOWN if by_color == WHITE else UP  # pawns attack from one row behind the square
+        for start in (square + behind + LEFT, square + behind + RIGHT):
+            if squares[start] == pawn:
+                return start
+        knight = by_color | KNIGHT
+        for start in KNIGHT_TARGETS[square]:
+            if squares[start] == knight:
+                return start
+        # the first piece along each ray: bishops on the diagonals, then rooks on the lines, then any queen
+        queen = by_color | QUEEN
+        queen_square = 0
+        for rays, slider in ((DIAGONAL_RAYS[square], by_color | BISHOP), (ORTHOGONAL_RAYS[square], by_color | ROOK)):
+            for _, ray in rays:
+                for start in ray:
+                    piece = squares[start]
+                    if piece != EMPTY:
+                        if piece == slider:
+                            return start
+                        if piece == queen:
+                            queen_square = start
+                        break
+        if queen_square:
+            return queen_square
+        king = by_color | KING
+        for start in KING_TARGETS[square]:
+            if squares[start] == king:
+                return start
+        return 0
 
-    def checkForPinsAndChecks(self):
+    def staticExchange(self, move):
         """
-        Check if there are any pins or checks on the current chessboard state.
-        return pins - a list of pinned pieces
-        return checks - a list of pieces that are checking the king
-        return in_check - a boolean indicating if the king is in check
+        The material, in pawns, the side to move expects to win with a capture once both sides have made every
+        profitable recapture on its target square, cheapest piece first. Negative for a losing capture.
         """
+        code = move.code
+        start = code & SQUARE_MASK
+        end = code >> MOVE_END_SHIFT & SQUARE_MASK
+        squares = self.squares
+        gains = [EXCHANGE_VALUES[code >> MOVE_CAPTURED_SHIFT & TYPE_MASK]]
+        on_square = EXCHANGE_VALUES[code >> MOVE_PIECE_SHIFT & TYPE_MASK]
+        if code & MOVE_PROMOTION:
+            gains[0] += EXCHANGE_VALUES[QUEEN] - EXCHANGE_VALUES[PAWN]
+            on_square = EXCHANGE_VALUES[QUEEN]
+        # lift each piece that takes part so the sliders behind it join in; put them all back at the end
+        removed = [(start, squares[start])]
+        squares[start] = EMPTY
+        if code & MOVE_ENPASSANT:
+            captured = end + (DOWN if self.whiteToMove else UP)
+            removed.append((captured, squares[captured]))
+            squares[captured] = EMPTY
+        color = BLACK if self.whiteToMove else WHITE
+        while True:
+            attacker = self.leastValuableAttacker(end, color)
+            if not attacker:
+                break
+            gain = on_square - gains[-1]
+            if max(-gains[-1], gain) < 0:
+                break  # this capture loses whether or not it is answered, so the exchange stops before it
+            gains.append(gain)
+            on_square = EXCHANGE_VALUES[squares[attacker] & TYPE_MASK]
+            removed.append((attacker, squares[attacker]))
+            squares[attacker] = EMPTY
+            color ^= WHITE | BLACK
+        for square, piece in removed:
+            squares[square] = piece
+        # each side stops recapturing when that is better for it
+        while len(gains) > 1:
+            gain = gains.pop()
+            gains[-1] = -max(-gains[-1], gain)
+        return gains[0]
+
+    def getCheckEvasions(self, king_square, moves):
+        """
+        Add the legal replies to a check: king moves and, against a single checker, captures of the checker
+        and interpositions on the check ray. Pinned pieces can never do either, so they are skipped.
+        """
+        self.getKingMoves(king_square, moves)
+        if len(self.checks) != 1:
+            return  # double check - only the king can move
+
+        squares = self.squares
+        pins = self.pins
+        check_square, check_direction = self.checks[0]
+        if squares[check_square] & TYPE_MASK == KNIGHT:
+            targets = [check_square]
+        else:
+            targets = []
+            square = king_square
+            while square != check_square:
+                square += check_direction
+                targets.append(square)
 
-        pins = []  
-        checks = []  
-        in_check = False
         if self.whiteToMove:
-            enemy_color = "b"
-            ally_color = "w"
-            startRow = self.whiteKingLocation[0]
-            startCol = self.whiteKingLocation[1]
+            ally_color, move_amount, double_push_row, promotion_row = WHITE, UP, 4, 0
         else:
-            enemy_color = "w"
-            ally_color = "b"
-            startRow = self.blackKingLocation[0]
-            startCol = self.blackKingLocation[1]
-        
-        directions = (
-            (-1, 0),
-            (0, -1),
-            (1, 0),
-            (0, 1),
-            (-1, -1),
-            (-1, 1),
-            (1, -1),
-            (1, 1),
-        )
-        for j in range(len(directions)):
-            direction = directions[j]
-            possible_pin = ()  # reset possible pins
-            for i in range(1, 8):
-                endRow = startRow + direction[0] * i
-                endCol = startCol + direction[1] * i
-                if 0 <= endRow <= 7 and 0 <= endCol <= 7:
-                    end_piece = self.board[endRow][endCol]
-                    if end_piece[0] == ally_color and end_piece[1] != "K":
-                        if possible_pin == ():  # first allied piece could be pinned
-                            possible_pin = (endRow, endCol, direction[0], direction[1])
-                        else:  # 2nd allied piece - no check or pin from this direction
+            ally_color, move_amount, double_push_row, promotion_row = BLACK, DOWN, 3, 7
+        pawn, knight, queen = ally_color | PAWN, ally_color | KNIGHT, ally_color | QUEEN
+        for end in targets:
+            end_piece = squares[end]  # the checker for the last target, empty for interpositions
+            end_code = end << MOVE_END_SHIFT | end_piece << MOVE_CAPTURED_SHIFT
+            # knights and sliders that reach the target, found by looking back from it
+            for start in KNIGHT_TARGETS[end]:
+                if squares[start] == knight and start not in pins:
+                    moves.append(Move.fromCode(start | knight << MOVE_PIECE_SHIFT | end_code))
+            for slider, rays in ((ally_color | ROOK, ORTHOGONAL_RAYS[end]), (ally_color | BISHOP, DIAGONAL_RAYS[end])):
+                for _, ray in rays:
+                    for start in ray:
+                        piece = squares[start]
+                        if piece != EMPTY:
+                            if (piece == slider or piece == queen) and start not in pins:
+                                moves.append(Move.fromCode(start | piece << MOVE_PIECE_SHIFT | end_code))
                             break
-                    elif end_piece[0] == enemy_color:
-                        enemy_type = end_piece[1]
-                        
-                        # 5 possibilities in this complex conditional
-                        # 1.) orthogonally away from king and piece is a rook
-                        # 2.) diagonally away from king and piece is a bishop
-                        # 3.) 1 square away diagonally from king and piece is a pawn
-                        # 4.) any direction and piece is a queen
-                        # 5.) any direction 1 square away and piece is a king
-                        if (
-                            (0 <= j <= 3 and enemy_type == "R")
-                            or (4 <= j <= 7 and enemy_type == "B")
-                            or (
-                                i == 1
-                                and enemy_type == "p"
-                                and (
-                                    (enemy_color == "w" and 6 <= j <= 7)
-                                    or (enemy_color == "b" and 4 <= j <= 5)
+            # pawns: captures onto the checker, single and double pushes onto an empty square
+            if SQUARE_ROWS[end] == promotion_row:
+                end_code |= MOVE_PROMOTION
+            if end_piece != EMPTY:
+                for start in (end - move_amount + LEFT, end - move_amount + RIGHT):
+                    if squares[start] == pawn and start not in pins:
+                        moves.append(Move.fromCode(start | pawn << MOVE_PIECE_SHIFT | end_code))
+            else:
+                start = end - move_amount
+                if squares[start] == pawn:
+                    if start not in pins:
+                        moves.append(Move.fromCode(start | pawn << MOVE_PIECE_SHIFT | end_code))
+                elif squares[start] == EMPTY and SQUARE_ROWS[end] == double_push_row:
+                    start -= move_amount
+                    if squares[start] == pawn and start not in pins:
+                        moves.append(Move.fromCode(start | pawn << MOVE_PIECE_SHIFT | end_code))
+
+        # en passant either removes a checking pawn or lands on the check ray
+        end = self.enpassant_square
+        if end:
+            captured = end - move_amount
+            if captured == check_square or end in targets:
+                end_code = end << MOVE_END_SHIFT | squares[captured] << MOVE_CAPTURED_SHIFT | MOVE_ENPASSANT
+                for start in (captured + LEFT, captured + RIGHT):
+                    if (
+                        squares[start] == pawn
+                        and start not in pins
+                        and not self.enpassantExposesKing(start, captured, king_square)
+                    ):
+                        moves.append(Move.fromCode(start | pawn << MOVE_PIECE_SHIFT | end_code))
+
+    def getCaptureMoves(self, ally_squares, moves):
+        """
+        Add every capture (en passant and capturing promotions included) by the pieces on ally_squares.
+        """
+        squares = self.squares
+        pins = self.pins
+        if self.whiteToMove:
+            enemy_color, move_amount, promotion_row, king_square = BLACK, UP, 0, self.whiteKingSquare
+        else:
+            enemy_color, move_amount, promotion_row, king_square = WHITE, DOWN, 7, self.blackKingSquare
+        for square in ally_squares:
+            piece = squares[square]
+            piece_type = piece & TYPE_MASK
+            pin_direction = pins.get(square)
+            base = square | piece << MOVE_PIECE_SHIFT
+            if piece_type == PAWN:
+                forward = square + move_amount
+                if SQUARE_ROWS[forward] == promotion_row:
+                    base |= MOVE_PROMOTION
+                for side in (LEFT, RIGHT):
+                    end = forward + side
+                    if pin_direction is None or pin_direction in (move_amount + side, -move_amount - side):
+                        if squares[end] & enemy_color:
+                            moves.append(Move.fromCode(base | end << MOVE_END_SHIFT | squares[end] << MOVE_CAPTURED_SHIFT))
+                        elif end == self.enpassant_square and not self.enpassantExposesKing(square, square + side, king_square):
+                            moves.append(
+                                Move.fromCode(
+                                    base
+                                    | end << MOVE_END_SHIFT
+                                    | (enemy_color | PAWN) << MOVE_CAPTURED_SHIFT
+                                    | MOVE_ENPASSANT
                                 )
                             )
-                            or (enemy_type == "Q")
-                            or (i == 1 and enemy_type == "K")
-                        ):
-                            if possible_pin == ():  # no piece blocking, so check
-                                in_check = True
-                                checks.append(
-                                    (endRow, endCol, direction[0], direction[1])
-                                )
-                                break
-                            else:  # piece blocking so pin
-                                pins.append(possible_pin)
+            elif piece_type == KNIGHT:
+                if pin_direction is None:
+                    for end in KNIGHT_TARGETS[square]:
+                        if squares[end] & enemy_color:
+                            moves.append(Move.fromCode(base | end << MOVE_END_SHIFT | squares[end] << MOVE_CAPTURED_SHIFT))
+            elif piece_type == KING:
+                squares[square] = EMPTY
+                for end in KING_TARGETS[square]:
+                    if squares[end] & enemy_color and not self.isSquareAttacked(end, enemy_color):
+                        moves.append(Move.fromCode(base | end << MOVE_END_SHIFT | squares[end] << MOVE_CAPTURED_SHIFT))
+                squares[square] = piece
+            else:
+                for direction, ray in SLIDER_RAYS[piece_type][square]:
+                    if pin_direction is None or pin_direction == direction or pin_direction == -direction:
+                        for end in ray:
+                            end_piece = squares[end]
+                            if end_piece != EMPTY:
+                                if end_piece & enemy_color:
+                                    moves.append(
+                                        Move.fromCode(base | end << MOVE_END_SHIFT | end_piece << MOVE_CAPTURED_SHIFT)
+                                    )
                                 break
-                        else:  # enemy piece not applying checks
-                            break
-                else:
-                    break  # off board
-        # check for knight checks
-        knight_moves = (
-            (-2, -1),
-            (-2, 1),
-            (-1, 2),
-            (1, 2),
-            (2, -1),
-            (2, 1),
-            (-1, -2),
-            (1, -2),
-        )
-        for move in knight_moves:
-            endRow = startRow + move[0]
-            endCol = startCol + move[1]
-            if 0 <= endRow <= 7 and 0 <= endCol <= 7:
-                end_piece = self.board[endRow][endCol]
-                if (
-                    end_piece[0] == enemy_color and end_piece[1] == "N"
-                ):  # enemy knight attacking a king
-                    in_check = True
-                    checks.append((endRow, endCol, move[0], move[1]))
-        return in_check, pins, checks
 
-    def getPawnMoves(self, row, col, moves):
+    def getPromotionMoves(self, ally_squares, moves):
         """
-        Get all the pawn moves for the pawn located at row, col and add the moves to the list.
+        Add the non-capturing promotions of the pawns on ally_squares.
         """
-        piece_pinned = False
-        pin_direction = ()
-        for i in range(len(self.pins) - 1, -1, -1):
-            if self.pins[i][0] == row and self.pins[i][1] == col:
-                piece_pinned = True
-                pin_direction = (self.pins[i][2], self.pins[i][3])
-                self.pins.remove(self.pins[i])
-                break
+        squares = self.squares
+        pins = self.pins
+        if self.whiteToMove:
+            pawn, move_amount, promotion_row = WHITE | PAWN, UP, 0
+        else:
+            pawn, move_amount, promotion_row = BLACK | PAWN, DOWN, 7
+        for square in ally_squares:
+            end = square + move_amount
+            if squares[square] == pawn and SQUARE_ROWS[end] == promotion_row and squares[end] == EMPTY:
+                pin_direction = pins.get(square)
+                if pin_direction is None or pin_direction in (move_amount, -move_amount):
+                    moves.append(Move.fromCode(square | pawn << MOVE_PIECE_SHIFT | end << MOVE_END_SHIFT | MOVE_PROMOTION))
 
+    def getQuietMoves(self, ally_squares, moves):
+        """
+        Add the non-capturing moves of the pieces on ally_squares other than promotions, then castling.
+        """
+        squares = self.squares
+        pins = self.pins
         if self.whiteToMove:
-            move_amount = -1
-            startRow = 6
-            enemy_color = "b"
-            king_row, king_col = self.whiteKingLocation
+            enemy_color, move_amount, start_row, promotion_row = BLACK, UP, 6, 0
+            king_square = self.whiteKingSquare
         else:
-            move_amount = 1
-            startRow = 1
-            enemy_color = "w"
-            king_row, king_col = self.blackKingLocation
-
-        if self.board[row + move_amount][col] == "--":  # 1 square pawn advance
-            if not piece_pinned or pin_direction == (move_amount, 0):
-                moves.append(Move((row, col), (row + move_amount, col), self.board))
+            enemy_color, move_amount, start_row, promotion_row = WHITE, DOWN, 1, 7
+            king_square = self.blackKingSquare
+        for square in ally_squares:
+            piece = squares[square]
+            piece_type = piece & TYPE_MASK
+            pin_direction = pins.get(square)
+            base = square | piece << MOVE_PIECE_SHIFT
+            if piece_type == PAWN:
+                forward = square + move_amount
                 if (
-                    row == startRow and self.board[row + 2 * move_amount][col] == "--"
-                ):  # 2 square pawn advance
-                    moves.append(
-                        Move((row, col), (row + 2 * move_amount, col), self.board)
-                    )
-        if col - 1 >= 0:  # capture to the left
-            if not piece_pinned or pin_direction == (move_amount, -1):
-                if self.board[row + move_amount][col - 1][0] == enemy_color:
-                    moves.append(
-                        Move((row, col), (row + move_amount, col - 1), self.board)
-                    )
-                if (row + move_amount, col - 1) == self.enpassant_possible:
-                    attacking_piece = blocking_piece = False
-                    if king_row == row:
-                        if king_col < col:  # king is left of the pawn
-                            # inside: between king and the pawn;
-                            # outside: between pawn and border;
-                            inside_range = range(king_col + 1, col - 1)
-                            outside_range = range(col + 1, 8)
-                        else:  # king right of the pawn
-                            inside_range = range(king_col - 1, col, -1)
-                            outside_range = range(col - 2, -1, -1)
-                        for i in inside_range:
-                            if (
-                                self.board[row][i] != "--"
-                            ):  # some piece beside en-passant pawn blocks
-                                blocking_piece = True
-                        for i in outside_range:
-                            square = self.board[row][i]
-                            if square[0] == enemy_color and (
-                                square[1] == "R" or square[1] == "Q"
-                            ):
-                                attacking_piece = True
-                            elif square != "--":
-                                blocking_piece = True
-                    if not attacking_piece or blocking_piece:
-                        moves.append(
-                            Move(
-                                (row, col),
-                                (row + move_amount, col - 1),
-                                self.board,
-                                is_enpassant_move=True,
-                            )
-                        )
-        if col + 1 <= 7:  # capture to the right
-            if not piece_pinned or pin_direction == (move_amount, +1):
-                if self.board[row + move_amount][col + 1][0] == enemy_color:
-                    moves.append(
-                        Move((row, col), (row + move_amount, col + 1), self.board)
-                    )
-                if (row + move_amount, col + 1) == self.enpassant_possible:
-                    attacking_piece = blocking_piece = False
-                    if king_row == row:
-                        if king_col < col:  # king is left of the pawn
-                            # inside: between king and the pawn;
-                            # outside: between pawn and border;
-                            inside_range = range(king_col + 1, col)
-                            outside_range = range(col + 2, 8)
-                        else:  # king right of the pawn
-                            inside_range = range(king_col - 1, col + 1, -1)
-                            outside_range = range(col - 1, -1, -1)
-                        for i in inside_range:
-                            if (
-                                self.board[row][i] != "--"
-                            ):  # some piece beside en-passant pawn blocks
-                                blocking_piece = True
-                        for i in outside_range:
-                            square = self.board[row][i]
-                            if square[0] == enemy_color and (
-                                square[1] == "R" or square[1] == "Q"
-                            ):
-                                attacking_piece = True
-                            elif square != "--":
-                                blocking_piece = True
-                    if not attacking_piece or blocking_piece:
-                        moves.append(
-                            Move(
-                                (row, col),
-                                (row + move_amount, col + 1),
-                                self.board,
-                                is_enpassant_move=True,
-                            )
-                        )
+                    squares[forward] == EMPTY
+                    and SQUARE_ROWS[forward] != promotion_row
+                    and (pin_direction is None or pin_direction in (move_amount, -move_amount))
+                ):
+                    moves.append(Move.fromCode(base | forward << MOVE_END_SHIFT))
+                    if SQUARE_ROWS[square] == start_row and squares[forward + move_amount] == EMPTY:
+                        moves.append(Move.fromCode(base | (forward + move_amount) << MOVE_END_SHIFT))
+            elif piece_type == KNIGHT:
+                if pin_direction is None:
+                    for end in KNIGHT_TARGETS[square]:
+                        if squares[end] == EMPTY:
+                            moves.append(Move.fromCode(base | end << MOVE_END_SHIFT))
+            elif piece_type == KING:
+                squares[square] = EMPTY
+                for end in KING_TARGETS[square]:
+                    if squares[end] == EMPTY and not self.isSquareAttacked(end, enemy_color):
+                        moves.append(Move.fromCode(base | end << MOVE_END_SHIFT))
+                squares[square] = piece
+            else:
+                for direction, ray in SLIDER_RAYS[piece_type][square]:
+                    if pin_direction is None or pin_direction == direction or pin_direction == -direction:
+                        for end in ray:
+                            if squares[end] != EMPTY:
+                                break
+                            moves.append(Move.fromCode(base | end << MOVE_END_SHIFT))
+        self.getCastleMoves(king_square, moves)
 
-    def getRookMoves(self, row, col, moves):
+    def enpassantExposesKing(self, square, captured, king_square):
         """
-        Get all the rook moves for the rook located at row, col and add the moves to the list.
+        True if the pawns on square and captured leaving the rank together would open it to an enemy rook
+        or queen standing beside the king.
         """
-        piece_pinned = False
-        pin_direction = ()
-        for i in range(len(self.pins) - 1, -1, -1):
-            if self.pins[i][0] == row and self.pins[i][1] == col:
-                piece_pinned = True
-                pin_direction = (self.pins[i][2], self.pins[i][3])
-                if (
-                    self.board[row][col][1] != "Q"
-                ):  # can't remove queen from pin on rook moves, only remove it on bishop moves
-                    self.pins.remove(self.pins[i])
-                break
+        if SQUARE_ROWS[king_square] != SQUARE_ROWS[square]:
+            return False
+        squares = self.squares
+        enemy_color = BLACK if self.whiteToMove else WHITE
+        # look along the rank from the king past both pawns for a rook or queen
+        step = RIGHT if king_square < square else LEFT
+        scan = king_square + step
+        while squares[scan] != OFFBOARD:
+            if scan != square and scan != captured:
+                scanned = squares[scan]
+                if scanned != EMPTY:
+                    return scanned & enemy_color != 0 and scanned & TYPE_MASK in (ROOK, QUEEN)
+            scan += step
+        return False
 
-        directions = ((-1, 0), (0, -1), (1, 0), (0, 1))  # up, left, down, right
-        enemy_color = "b" if self.whiteToMove else "w"
-        for direction in directions:
-            for i in range(1, 8):
-                endRow = row + direction[0] * i
-                endCol = col + direction[1] * i
-                if (
-                    0 <= endRow <= 7 and 0 <= endCol <= 7
-                ):  # check for possible moves only in boundaries of the board
-                    if (
-                        not piece_pinned
-                        or pin_direction == direction
-                        or pin_direction == (-direction[0], -direction[1])
-                    ):
-                        end_piece = self.board[endRow][endCol]
-                        if end_piece == "--":  # empty space is valid
-                            moves.append(Move((row, col), (endRow, endCol), self.board))
-                        elif end_piece[0] == enemy_color:  # capture enemy piece
-                            moves.append(Move((row, col), (endRow, endCol), self.board))
-                            break
-                        else:  # friendly piece
+    def countMoves(self, color):
+        """
+        Count the pseudo-legal moves of color's pieces without building them: pawn pushes and captures,
+        and every empty or enemy square a knight, slider or king reaches. Pins, checks, castling and
+        en passant are ignored, which is close enough for scoring mobility.
+        """
+        squares = self.squares
+        if color == WHITE:
+            enemy_color, move_amount, start_row = BLACK, UP, 6
+        else:
+            enemy_color, move_amount, start_row = WHITE, DOWN, 1
+        count = 0
+        for square in BOARD_SQUARES:
+            piece = squares[square]
+            if not piece & color:
+                continue
+            piece_type = piece & TYPE_MASK
+            if piece_type == PAWN:
+                forward = square + move_amount
+                if squares[forward] == EMPTY:
+                    count += 1
+                    if SQUARE_ROWS[square] == start_row and squares[forward + move_amount] == EMPTY:
+                        count += 1
+                if squares[forward + LEFT] & enemy_color:
+                    count += 1
+                if squares[forward + RIGHT] & enemy_color:
+                    count += 1
+            elif piece_type == KNIGHT or piece_type == KING:
+                for end in (KNIGHT_TARGETS if piece_type == KNIGHT else KING_TARGETS)[square]:
+                    if not squares[end] & color:
+                        count += 1
+            else:
+                for _, ray in SLIDER_RAYS[piece_type][square]:
+                    for end in ray:
+                        end_piece = squares[end]
+                        if end_piece != EMPTY:
+                            if end_piece & enemy_color:
+                                count += 1
                             break
-                else:  # off board
-                    break
+                        count += 1
+        return count
 
-    def getKnightMoves(self, row, col, moves):
+    def mobility(self):
         """
-        Get all the knight moves for the knight located at row col and add the moves to the list.
+        White's pseudo-legal move count minus black's.
         """
-        piece_pinned = False
-        for i in range(len(self.pins) - 1, -1, -1):
-            if self.pins[i][0] == row and self.pins[i][1] == col:
-                piece_pinned = True
-                self.pins.remove(self.pins[i])
-                break
+        return self.countMoves(WHITE) - self.countMoves(BLACK)
 
-        knight_moves = (
-            (-2, -1),
-            (-2, 1),
-            (-1, 2),
-            (1, 2),
-            (2, -1),
-            (2, 1),
-            (-1, -2),
-            (1, -2),
-        )  # up/left up/right right/up right/down down/left down/right left/up left/down
-        ally_color = "w" if self.whiteToMove else "b"
-        for move in knight_moves:
-            endRow = row + move[0]
-            endCol = col + move[1]
-            if 0 <= endRow <= 7 and 0 <= endCol <= 7:
-                if not piece_pinned:
-                    end_piece = self.board[endRow][endCol]
-                    if (
-                        end_piece[0] != ally_color
-                    ):  # so its either enemy piece or empty square
-                        moves.append(Move((row, col), (endRow, endCol), self.board))
-
-    def getBishopMoves(self, row, col, moves):
+    def checkForPinsAndChecks(self):
         """
-        Get all the bishop moves for the bishop located at row col and add the moves to the list.
+        Check if there are any pins or checks on the current chessboard state.
+        return pins - pinned squares mapped to the direction of the pin
+        return checks - (square, direction) of every piece checking the king
+        return in_check - a boolean indicating if the king is in check
         """
-        piece_pinned = False
-        pin_direction = ()
-        for i in range(len(self.pins) - 1, -1, -1):
-            if self.pins[i][0] == row and self.pins[i][1] == col:
-                piece_pinned = True
-                pin_direction = (self.pins[i][2], self.pins[i][3])
-                self.pins.remove(self.pins[i])
-                break
 
-        directions = (
-            (-1, -1),
-            (-1, 1),
-            (1, 1),
-            (1, -1),
-        )  # diagonals: up/left up/right down/right down/left
-        enemy_color = "b" if self.whiteToMove else "w"
-        for direction in directions:
-            for i in range(1, 8):
-                endRow = row + direction[0] * i
-                endCol = col + direction[1] * i
-                if (
-                    0 <= endRow <= 7 and 0 <= endCol <= 7
-                ):  # check if the move is on board
-                    if (
-                        not piece_pinned
-                        or pin_direction == direction
-                        or pin_direction == (-direction[0], -direction[1])
-                    ):
-                        end_piece = self.board[endRow][endCol]
-                        if end_piece == "--":  # empty space is valid
-                            moves.append(Move((row, col), (endRow, endCol), self.board))
-                        elif end_piece[0] == enemy_color:  # capture enemy piece
-                            moves.append(Move((row, col), (endRow, endCol), self.board))
-                            break
-                        else:  # friendly piece
+        pins = {}
+        checks = []
+        in_check = False
+        squares = self.squares
+        if self.whiteToMove:
+            enemy_color = BLACK
+            ally_color = WHITE
+            start = self.whiteKingSquare
+            enemy_pawn_directions = (UP + LEFT, UP + RIGHT)
+        else:
+            enemy_color = WHITE
+            ally_color = BLACK
+            start = self.blackKingSquare
+            enemy_pawn_directions = (DOWN + LEFT, DOWN + RIGHT)
+
+        for sliders, rays in (
+            ((ROOK, QUEEN), ORTHOGONAL_RAYS[start]),
+            ((BISHOP, QUEEN), DIAGONAL_RAYS[start]),
+        ):
+            for direction, ray in rays:
+                possible_pin = 0  # reset possible pins
+                adjacent = ray[0]
+                for square in ray:
+                    end_piece = squares[square]
+                    if end_piece & ally_color:
+                        if not possible_pin:  # first allied piece could be pinned
+                            possible_pin = square
+                        else:  # 2nd allied piece - no check or pin from this direction
                             break
-                else:  # off board
-                    break
-
-    def getQueenMoves(self, row, col, moves):
-        """
-        Get all the queen moves for the queen located at row col and add the moves to the list.
-        """
-        self.getBishopMoves(row, col, moves)
-        self.getRookMoves(row, col, moves)
-
-    def getKingMoves(self, row, col, moves):
-        """
-        Get all the king moves for the king located at row col and add the moves to the list.
-        """
-        row_moves = (-1, -1, -1, 0, 0, 1, 1, 1)
-        col_moves = (-1, 0, 1, -1, 1, -1, 0, 1)
-        ally_color = "w" if self.whiteToMove else "b"
-        for i in range(8):
-            endRow = row + row_moves[i]
-            endCol = col + col_moves[i]
-            if 0 <= endRow <= 7 and 0 <= endCol <= 7:
-                end_piece = self.board[endRow][endCol]
-                if end_piece[0] != ally_color:  # not an ally piece - empty or enemy
-                    # place king on end square and check for checks
-                    if ally_color == "w":
-                        self.whiteKingLocation = (endRow, endCol)
-                    else:
-                        self.blackKingLocation = (endRow, endCol)
-                    in_check, pins, checks = self.checkForPinsAndChecks()
-                    if not in_check:
-                        moves.append(Move((row, col), (endRow, endCol), self.board))
-                    # place king back on original location
-                    if ally_color == "w":
-                        self.whiteKingLocation = (row, col)
-                    else:
-                        self.blackKingLocation = (row, col)
-
-    def getCastleMoves(self, row, col, moves):
-        """
-        Generate all valid castle moves for the king at (row, col) and add them to the list of moves.
-        """
-        if self.squareUnderAttack(row, col):
+                    elif end_piece & enemy_color:
+                        enemy_type = end_piece & TYPE_MASK
+                        # a slider moving along this line, an adjacent pawn capturing towards the king,
+                        # or the adjacent enemy king
+                        if (
+                            enemy_type in sliders
+                            or (square == adjacent and enemy_type == PAWN and direction in enemy_pawn_directions)
+                            or (square == adjacent and enemy_type == KING)
+                        ):
+                            if not possible_pin:  # no piece blocking, so check
+                                in_check = True
+                                checks.append((square, direction))
+                            else:  # piece blocking so pin
+                                pins[possible_pin] = direction
+                        break
+        # check for knight checks
+        knight = enemy_color | KNIGHT
+        for square in KNIGHT_TARGETS[start]:
+            if squares[square] == knight:  # enemy knight attacking a king
+                in_check = True
+                checks.append((square, square - start))
+        return in_check, pins, checks
+
+    def getKingMoves(self, square, moves):
+        """
+        Get all the king moves for the king located on square and add the moves to the list.
+        """
+        squares = self.squares
+        if self.whiteToMove:
+            ally_color, enemy_color = WHITE, BLACK
+        else:
+            ally_color, enemy_color = BLACK, WHITE
+        king = squares[square]
+        base = square | king << MOVE_PIECE_SHIFT
+        # lift the king off its square so it can't shield the square behind it from a slider
+        squares[square] = EMPTY
+        for end in KING_TARGETS[square]:
+            end_piece = squares[end]
+            if not end_piece & ally_color:  # not an ally piece - empty or enemy
+                if not self.isSquareAttacked(end, enemy_color):
+                    moves.append(Move.fromCode(base | end << MOVE_END_SHIFT | end_piece << MOVE_CAPTURED_SHIFT))
+        squares[square] = king
+
+    def getCastleMoves(self, square, moves):
+        """
+        Generate all valid castle moves for the king on square and add them to the list of moves.
+        """
+        if self.isSquareAttacked(square, BLACK if self.whiteToMove else WHITE):
             return  # can't castle while in check
-        if (self.whiteToMove and self.current_castling_rights.wks) or (
-            not self.whiteToMove and self.current_castling_rights.bks
-        ):
-            self.getKingsideCastleMoves(row, col, moves)
-        if (self.whiteToMove and self.current_castling_rights.wqs) or (
-            not self.whiteToMove and self.current_castling_rights.bqs
-        ):
-            self.getQueensideCastleMoves(row, col, moves)
+        if self.whiteToMove:
+            kingside, queenside = CASTLE_WKS, CASTLE_WQS
+        else:
+            kingside, queenside = CASTLE_BKS, CASTLE_BQS
+        if self.castling_rights & kingside:
+            self.getKingsideCastleMoves(square, moves)
+        if self.castling_rights & queenside:
+            self.getQueensideCastleMoves(square, moves)
 
-    def getKingsideCastleMoves(self, row, col, moves):
+    def getKingsideCastleMoves(self, square, moves):
         """
-        Given the current state of the chess board, the row and column of a piece, and a list of possible moves, check if a kingside castle move is possible. If it is, add the move to the list of moves.
+        Given the current state of the chess board, the king's square, and a list of possible moves, check if a kingside castle move is possible. If it is, add the move to the list of moves.
         """
-        if self.board[row][col + 1] == "--" and self.board[row][col + 2] == "--":
-            if not self.squareUnderAttack(row, col + 1) and not self.squareUnderAttack(
-                row, col + 2
-            ):
+        squares = self.squares
+        enemy_color = BLACK if self.whiteToMove else WHITE
+        if squares[square + 1] == EMPTY and squares[square + 2] == EMPTY:
+            if not self.isSquareAttacked(square + 1, enemy_color) and not self.isSquareAttacked(square + 2, enemy_color):
                 moves.append(
-                    Move((row, col), (row, col + 2), self.board, is_castle_move=True)
+                    Move.fromCode(
+                        square | (square + 2) << MOVE_END_SHIFT | squares[square] << MOVE_PIECE_SHIFT | MOVE_CASTLE
+                    )
                 )
 
-    def getQueensideCastleMoves(self, row, col, moves):
+    def getQueensideCastleMoves(self, square, moves):
         """
-        Given the current position of a piece on the chessboard, check if queenside castle move is possible. If the squares to the left of the piece are empty and not under attack, add the move to the list of possible moves.
+        Given the king's square, check if queenside castle move is possible. If the squares to the left of the king are empty and not under attack, add the move to the list of possible moves.
         """
-
-        if (
-            self.board[row][col - 1] == "--"
-            and self.board[row][col - 2] == "--"
-            and self.board[row][col - 3] == "--"
-        ):
-            if not self.squareUnderAttack(row, col - 1) and not self.squareUnderAttack(
-                row, col - 2
-            ):
+        squares = self.squares
+        enemy_color = BLACK if self.whiteToMove else WHITE
+        if squares[square - 1] == EMPTY and squares[square - 2] == EMPTY and squares[square - 3] == EMPTY:
+            if not self.isSquareAttacked(square - 1, enemy_color) and not self.isSquareAttacked(square - 2, enemy_color):
                 moves.append(
-                    Move((row, col), (row, col - 2), self.board, is_castle_move=True)
+                    Move.fromCode(
+                        square | (square - 2) << MOVE_END_SHIFT | squares[square] << MOVE_PIECE_SHIFT | MOVE_CASTLE
+                    )
                 )
 
 
@@ -710,6 +1362,14 @@ class CastleRights:
 
 
 class Move:
+    """
+    A move packed into a single integer: start and end mailbox squares, the moved and captured piece codes, and
+    en passant / castle / promotion flags. Everything else (rows and columns, piece names, notation) is decoded
+    from that integer on request, so generating a move costs one small object.
+    """
+
+    __slots__ = ("code",)
+
     ranks_to_rows = {"1": 7, "2": 6, "3": 5, "4": 4, "5": 3, "6": 2, "7": 1, "8": 0}
     rows_to_ranks = {v: k for k, v in ranks_to_rows.items()}
     files_to_cols = {"a": 0, "b": 1, "c": 2, "d": 3, "e": 4, "f": 5, "g": 6, "h": 7}
@@ -723,44 +1383,121 @@ class Move:
         is_enpassant_move=False,
         is_castle_move=False,
     ):
-        self.startRow = start_square[0]
-        self.startCol = start_square[1]
-        self.endRow = end_square[0]
-        self.endCol = end_square[1]
-        
+        start_row, start_col = start_square
+        end_row, end_col = end_square
+
         # Add bounds checking to prevent IndexError
-        if (0 <= self.startRow < 8 and 0 <= self.startCol < 8 and 
-            0 <= self.endRow < 8 and 0 <= self.endCol < 8):
-            self.pieceMoved = board[self.startRow][self.startCol]
-            self.pieceCaptured = board[self.endRow][self.endCol]
+        if (0 <= start_row < 8 and 0 <= start_col < 8 and
+            0 <= end_row < 8 and 0 <= end_col < 8):
+            piece_moved = PIECE_CODES[board[start_row][start_col]]
+            piece_captured = PIECE_CODES[board[end_row][end_col]]
         else:
             # Set default values if out of bounds
-            self.pieceMoved = "--"
-            self.pieceCaptured = "--"
-            
-        self.is_pawn_promotion = (self.pieceMoved == "wp" and self.endRow == 0) or (
-            self.pieceMoved == "bp" and self.endRow == 7
-        )
-        self.is_enpassant_move = is_enpassant_move
-        if self.is_enpassant_move:
-            self.pieceCaptured = "wp" if self.pieceMoved == "bp" else "bp"
-        self.is_castle_move = is_castle_move
+            piece_moved = EMPTY
+            piece_captured = EMPTY
 
-        self.is_capture = self.pieceCaptured != "--"
-        self.moveID = (
-            self.startRow * 1000 + self.startCol * 100 + self.endRow * 10 + self.endCol
+        flags = 0
+        if (piece_moved == WHITE | PAWN and end_row == 0) or (piece_moved == BLACK | PAWN and end_row == 7):
+            flags |= MOVE_PROMOTION
+        if is_enpassant_move:
+            flags |= MOVE_ENPASSANT
+            piece_captured = (piece_moved ^ (WHITE | BLACK)) if piece_moved else EMPTY
+        if is_castle_move:
+            flags |= MOVE_CASTLE
+        self.code = (
+            squareIndex(start_row, start_col)
+            | squareIndex(end_row, end_col) << MOVE_END_SHIFT
+            | piece_moved << MOVE_PIECE_SHIFT
+            | piece_captured << MOVE_CAPTURED_SHIFT
+            | flags
         )
 
+    @classmethod
+    def fromCode(cls, code):
+        """
+        Wrap an already packed move integer, as the move generators do.
+        """
+        move = cls.__new__(cls)
+        move.code = code
+        return move
+
+    @property
+    def startSq(self):
+        return self.code & SQUARE_MASK
+
+    @property
+    def endSq(self):
+        return (self.code >> MOVE_END_SHIFT) & SQUARE_MASK
+
+    @property
+    def startRow(self):
+        return SQUARE_ROWS[self.code & SQUARE_MASK]
+
+    @property
+    def startCol(self):
+        return SQUARE_COLS[self.code & SQUARE_MASK]
+
+    @property
+    def endRow(self):
+        return SQUARE_ROWS[(self.code >> MOVE_END_SHIFT) & SQUARE_MASK]
+
+    @property
+    def endCol(self):
+        return SQUARE_COLS[(self.code >> MOVE_END_SHIFT) & SQUARE_MASK]
+
+    @property
+    def pieceMovedCode(self):
+        return (self.code >> MOVE_PIECE_SHIFT) & PIECE_FIELD_MASK
+
+    @property
+    def pieceCapturedCode(self):
+        return (self.code >> MOVE_CAPTURED_SHIFT) & PIECE_FIELD_MASK
+
+    @property
+    def pieceMoved(self):
+        return PIECE_NAMES[(self.code >> MOVE_PIECE_SHIFT) & PIECE_FIELD_MASK]
+
+    @property
+    def pieceCaptured(self):
+        return PIECE_NAMES[(self.code >> MOVE_CAPTURED_SHIFT) & PIECE_FIELD_MASK]
+
+    @property
+    def is_pawn_promotion(self):
+        return self.code & MOVE_PROMOTION != 0
+
+    @property
+    def is_enpassant_move(self):
+        return self.code & MOVE_ENPASSANT != 0
+
+    @property
+    def is_castle_move(self):
+        return self.code & MOVE_CASTLE != 0
+
+    @property
+    def is_capture(self):
+        return (self.code >> MOVE_CAPTURED_SHIFT) & PIECE_FIELD_MASK != EMPTY
+
+    @property
+    def moveID(self):
+        return self.startRow * 1000 + self.startCol * 100 + self.endRow * 10 + self.endCol
+
+    def __reduce__(self):
+        return Move.fromCode, (self.code,)
+
     def __eq__(self, other):
+        # two moves are the same when they go between the same squares (promotion is always to a queen)
         if isinstance(other, Move):
-            return self.moveID == other.moveID
+            return self.code & MOVE_SQUARES_MASK == other.code & MOVE_SQUARES_MASK
         return False
 
+    def __hash__(self):
+        return self.code & MOVE_SQUARES_MASK
+
     def getChessNotations(self):
         if self.is_pawn_promotion:
             return self.getRankFile(self.endRow, self.endCol) + "Q"
         if self.is_castle_move:
-            if self.endCol == 1:
+            if self.endCol == 2:
                 return "0-0-0"
             else:
                 return "0-0"
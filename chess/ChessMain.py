@@ -1,15 +1,16 @@
 import pygame as p
-import ChessEngine, ChessAI
-from multiprocessing import Process, Queue
+import ChessEngine, ChessAI, ChessBitboard
+from queue import Queue
 import os
 
 WIDTH = HEIGHT = 500
 MOVE_LOG_PANEL_WIDTH = 250
 MOVE_LOG_PANEL_HEIGHT = HEIGHT
-AI_INFO_PANEL_HEIGHT = 210  # Increased from 150 to 200 to accommodate all stats
+AI_INFO_PANEL_HEIGHT = 240  # Tall enough for every search, move ordering and parallelization stat
 DIMENSION = 8
 SQ_SIZE = HEIGHT // DIMENSION
 MAX_FPS = 30
+USE_BITBOARDS = False  # generate moves from bitboards instead of the 8x8 board (slower; for cross-checking)
 
 Images={}
 def loadImages():
@@ -18,143 +19,153 @@ def loadImages():
         Images[piece] = p.transform.scale(p.image.load("images/"+piece+".png"),(SQ_SIZE,SQ_SIZE))
 
 
+def newGameState():
+    """
+    Create the game state backend selected by USE_BITBOARDS. ChessAI works on whichever one it is handed.
+    """
+    if USE_BITBOARDS:
+        return ChessBitboard.BitboardGameState()
+    return ChessEngine.GameState()
+
+
 def main():
-    p.init()
-    screen = p.display.set_mode((WIDTH + MOVE_LOG_PANEL_WIDTH, HEIGHT + AI_INFO_PANEL_HEIGHT))
-    clock = p.time.Clock()
-    screen.fill(p.Color("white"))
-    gs = ChessEngine.GameState()
-    validMoves = gs.getValidMoves()
-    moveMade = False
-    animate = False
-    loadImages()
-    running = True
-    sqSelected = ()
-    playerClicks = []
-    gameOver = False
-
-    aiThinking = False
-    moveUndone = False
-    moveFinderProcess = None
-    moveLogFont = p.font.SysFont("Arial", 14, False, False)
-    aiInfoFont = p.font.SysFont("Arial", 14, False, False)
-    p1 = True  # if a human is playing white, then this will be True, else False
-    p2 = False  # if a human is playing black, then this will be True, else False
-
-
-    while running :
-        human_turn = (gs.whiteToMove and p1) or (not gs.whiteToMove and p2)
-        if gs.whiteToMove:
-            p.display.set_caption("White's Turn")
-        else:
-            p.display.set_caption("Black's Turn")
+    engine = ChessAI.EnginePool()  # started before the display so the workers don't inherit it
+    try:
+        p.init()
+        screen = p.display.set_mode((WIDTH + MOVE_LOG_PANEL_WIDTH, HEIGHT + AI_INFO_PANEL_HEIGHT))
+        clock = p.time.Clock()
+        screen.fill(p.Color("white"))
+        gs = newGameState()
+        validMoves = gs.getValidMoves()
+        moveMade = False
+        animate = False
+        loadImages()
+        running = True
+        sqSelected = ()
+        playerClicks = []
+        gameOver = False
+
+        aiThinking = False
+        ai_stats = dict(ChessAI.ai_stats)  # the stats of the last finished search, shown until the next one finishes
+        moveUndone = False
+        moveLogFont = p.font.SysFont("Arial", 14, False, False)
+        aiInfoFont = p.font.SysFont("Arial", 14, False, False)
+        p1 = True  # if a human is playing white, then this will be True, else False
+        p2 = False  # if a human is playing black, then this will be True, else False
+
+
+        while running :
+            human_turn = (gs.whiteToMove and p1) or (not gs.whiteToMove and p2)
+            if gs.whiteToMove:
+                p.display.set_caption("White's Turn")
+            else:
+                p.display.set_caption("Black's Turn")
 
         
-        for e in p.event.get():
-            if e.type == p.QUIT:
-                running = False
-                continue
-            elif e.type == p.MOUSEBUTTONDOWN:
-                if not gameOver and human_turn:  # Only process mouse clicks if it's human's turn
-                    location = p.mouse.get_pos()
-                    col = location[0]//SQ_SIZE
-                    row = location[1]//SQ_SIZE
-                    if sqSelected ==(row,col) or col >= 8:
-                        sqSelected=()
-                        playerClicks=[]
+            for e in p.event.get():
+                if e.type == p.QUIT:
+                    running = False
+                    continue
+                elif e.type == p.MOUSEBUTTONDOWN:
+                    if not gameOver and human_turn:  # Only process mouse clicks if it's human's turn
+                        location = p.mouse.get_pos()
+                        col = location[0]//SQ_SIZE
+                        row = location[1]//SQ_SIZE
+                        if sqSelected ==(row,col) or col >= 8:
+                            sqSelected=()
+                            playerClicks=[]
+                        else:
+                            sqSelected=(row,col)
+                            playerClicks.append(sqSelected)
+                        if len(playerClicks)==2:  # Removed redundant human_turn check here
+                            move = ChessEngine.Move(playerClicks[0],playerClicks[1],gs.board)
+                            for i in range(len(validMoves)):
+                                if move == validMoves[i]:
+                                    gs.makeMove(validMoves[i])
+                                    moveMade = True
+                                    animate = True
+                                    sqSelected=()
+                                    playerClicks=[]
+                            if not moveMade:
+                                playerClicks = [sqSelected]
+                elif e.type == p.KEYDOWN:
+                    if e.key == p.K_z:
+                        gs.undoMove()
+                        moveMade = True
+                        animate = False
+                        gameOver = False
+                        if aiThinking:
+                            engine.terminate()
+                            aiThinking = False
+                        moveUndone = True
+
+                    if e.key == p.K_r:
+                        gs = newGameState()
+                        validMoves = gs.getValidMoves()
+                        sqSelected = ()
+                        playerClicks = []
+                        moveMade = False
+                        animate = False
+                        gameOver = False
+                        if aiThinking:
+                            engine.terminate()
+                            aiThinking = False
+                        moveUndone = True
+
+            # AI move finder
+            if not gameOver and not human_turn and not moveUndone:
+                if not aiThinking:
+                    aiThinking = True
+                    return_queue = Queue()  # used to pass data between threads
+                    engine.start(gs, validMoves, return_queue)
+
+                if not engine.is_alive():
+                    result = return_queue.get()
+                    # Check if result is a tuple containing both move and stats
+                    if isinstance(result, tuple) and len(result) == 2:
+                        ai_move, ai_stats = result
                     else:
-                        sqSelected=(row,col)
-                        playerClicks.append(sqSelected)
-                    if len(playerClicks)==2:  # Removed redundant human_turn check here
-                        move = ChessEngine.Move(playerClicks[0],playerClicks[1],gs.board)
-                        for i in range(len(validMoves)):
-                            if move == validMoves[i]:
-                                gs.makeMove(validMoves[i])
-                                moveMade = True
-                                animate = True
-                                sqSelected=()
-                                playerClicks=[]
-                        if not moveMade:
-                            playerClicks = [sqSelected]
-            elif e.type == p.KEYDOWN:
-                if e.key == p.K_z:
-                    gs.undoMove()
-                    moveMade = True
-                    animate = False
-                    gameOver = False
-                    if aiThinking:
-                        moveFinderProcess.terminate()
-                        aiThinking = False
-                    moveUndone = True
-
-                if e.key == p.K_r:
-                    gs = ChessEngine.GameState()
-                    validMoves = gs.getValidMoves()
-                    sqSelected = ()
-                    playerClicks = []
-                    moveMade = False
-                    animate = False
-                    gameOver = False
-                    if aiThinking:
-                        moveFinderProcess.terminate()
-                        aiThinking = False
-                    moveUndone = True
-
-        # AI move finder
-        if not gameOver and not human_turn and not moveUndone:
-            if not aiThinking:
-                aiThinking = True
-                return_queue = Queue()  # used to pass data between threads
-                moveFinderProcess = Process(target=ChessAI.findBestMove, args=(gs, validMoves, return_queue))
-                moveFinderProcess.start()
-
-            if not moveFinderProcess.is_alive():
-                result = return_queue.get()
-                # Check if result is a tuple containing both move and stats
-                if isinstance(result, tuple) and len(result) == 2:
-                    ai_move, received_stats = result
-                    # Update the global AI stats in ChessAI module with received stats
-                    ChessAI.ai_stats = received_stats
-                else:
-                    ai_move = result
+                        ai_move = result
                     
-                if ai_move is None:
-                    ai_move = ChessAI.findRandomMove(validMoves)
+                    if ai_move is None:
+                        ai_move = ChessAI.findRandomMove(validMoves)
                     
-                gs.makeMove(ai_move)
-                moveMade = True
-                animate = True
-                aiThinking = False
+                    gs.makeMove(ai_move)
+                    moveMade = True
+                    animate = True
+                    aiThinking = False
 
         
-        if moveMade:
-            if animate:
-                animateMove(gs.moveLog[-1], screen, gs.board, clock)
-            validMoves = gs.getValidMoves()
-            moveMade = False
-            animate = False
-            moveUndone = False
+            if moveMade:
+                if animate:
+                    animateMove(gs.moveLog[-1], screen, gs.board, clock)
+                validMoves = gs.getValidMoves()
+                moveMade = False
+                animate = False
+                moveUndone = False
     
-        drawGameState(screen,gs,validMoves,sqSelected)
+            drawGameState(screen,gs,validMoves,sqSelected)
 
-        if not gameOver:
-            drawMoveLog(screen, gs, moveLogFont)
-            drawAIInfoPanel(screen, aiInfoFont, gs)
+            if not gameOver:
+                drawMoveLog(screen, gs, moveLogFont)
+                drawAIInfoPanel(screen, aiInfoFont, gs, ai_stats)
 
         
-        if gs.checkmate:
-            gameOver = True
-            if gs.whiteToMove:
-                drawEndGameText(screen, "Black wins by checkmate")
-            else:
-                drawEndGameText(screen, "White wins by checkmate")
+            if gs.checkmate:
+                gameOver = True
+                if gs.whiteToMove:
+                    drawEndGameText(screen, "Black wins by checkmate")
+                else:
+                    drawEndGameText(screen, "White wins by checkmate")
 
-        elif gs.stalemate:
-            gameOver = True
-            drawEndGameText(screen, "Stalemate")
+            elif gs.stalemate:
+                gameOver = True
+                drawEndGameText(screen, "Stalemate")
 
-        clock.tick(MAX_FPS)
-        p.display.flip()
+            clock.tick(MAX_FPS)
+            p.display.flip()
+    finally:
+        engine.close()  # stops the workers and frees the shared transposition table even if the game loop fails
 
 def drawGameState(screen,gs,validMoves,sqSelected):
     drawBoard(screen)
@@ -247,7 +258,7 @@ def drawMoveLog(screen, gs, font):
         text_y += text_object.get_height() + line_spacing
 
 
-def drawAIInfoPanel(screen, font, gs):
+def drawAIInfoPanel(screen, font, gs, ai_stats):
     """
     Draws the AI info panel with detailed performance metrics.
     """
@@ -261,38 +272,40 @@ def drawAIInfoPanel(screen, font, gs):
     material_balance = calculate_material_balance(gs)
     
     # Update stats for current move
-    if ChessAI.ai_stats["positions_evaluated"] > 0:
-        ChessAI.ai_stats["nodes_for_current_move"] = ChessAI.ai_stats["positions_evaluated"]
-        ChessAI.ai_stats["nodes_pruned_for_current_move"] = ChessAI.ai_stats["alpha_beta_cutoffs"]
+    if ai_stats["positions_evaluated"] > 0:
+        ai_stats["nodes_for_current_move"] = ai_stats["positions_evaluated"]
+        ai_stats["nodes_pruned_for_current_move"] = ai_stats["alpha_beta_cutoffs"]
     
     # Create two columns of information
     left_column = [
         "POSITION EVALUATION",
         f"Current Score: {current_position_score:.2f}" + (" (White advantage)" if current_position_score > 0 else " (Black advantage)" if current_position_score < 0 else " (Equal)"),
         f"Material Balance: {material_balance:.1f}" + (" (White)" if material_balance > 0 else " (Black)" if material_balance < 0 else " (Equal)"),
-        f"Search Depth: {ChessAI.DEPTH}",
+        f"Search Depth: {ai_stats['max_depth_reached']} of {ChessAI.DEPTH} ({ChessAI.TIME_LIMIT:g} sec limit)",
         " ",
         "SEARCH STATISTICS",
-        f"Positions Evaluated: {ChessAI.ai_stats['positions_evaluated']:,}",
-        f"Positions/Second: {ChessAI.ai_stats['positions_evaluated'] / max(0.001, ChessAI.ai_stats['time_spent']):,.0f}",
-        f"Computation Time: {ChessAI.ai_stats['time_spent']:.3f} sec"
+        f"Positions Evaluated: {ai_stats['positions_evaluated']:,}",
+        f"Positions/Second: {ai_stats['positions_evaluated'] / max(0.001, ai_stats['time_spent']):,.0f}",
+        f"Computation Time: {ai_stats['time_spent']:.3f} sec"
     ]
     
     right_column = [
         "PRUNING EFFICIENCY",
-        f"Alpha-Beta Cutoffs: {ChessAI.ai_stats['alpha_beta_cutoffs']:,}",
-        f"Pruning Efficiency: {ChessAI.ai_stats['alpha_beta_cutoffs'] / max(1, ChessAI.ai_stats['positions_evaluated']):.2%}",  # Fixed missing closing parenthesis
+        f"Alpha-Beta Cutoffs: {ai_stats['alpha_beta_cutoffs']:,}",
+        f"Pruning Efficiency: {ai_stats['alpha_beta_cutoffs'] / max(1, ai_stats['positions_evaluated']):.2%}",  # Fixed missing closing parenthesis
+        f"First-Move Cutoffs: {ai_stats['first_move_cutoffs'] / max(1, ai_stats['alpha_beta_cutoffs']):.2%}"
+        + (" (ordered)" if ChessAI.MOVE_ORDERING else " (unordered)"),
         " ",
         "CURRENT MOVE ANALYSIS",
-        f"Nodes Explored: {ChessAI.ai_stats['nodes_for_current_move']:,}",
-        f"Nodes Pruned: {ChessAI.ai_stats['nodes_pruned_for_current_move']:,}"
+        f"Nodes Explored: {ai_stats['nodes_for_current_move']:,}",
+        f"Nodes Pruned: {ai_stats['nodes_pruned_for_current_move']:,}"
     ]
     
     # Add parallel efficiency if available but keep it shorter
-    if ChessAI.ai_stats.get("parallel_efficiency", 0) > 0:
+    if ai_stats.get("parallel_efficiency", 0) > 0:
         right_column.append(" ")
         right_column.append("PARALLELIZATION")
-        right_column.append(f"Speedup: {ChessAI.ai_stats['parallel_efficiency']:.2f}x ({ChessAI.NUM_WORKERS} cores)")
+        right_column.append(f"Speedup: {ai_stats['parallel_efficiency']:.2f}x ({ChessAI.NUM_WORKERS} cores)")
     
     # Display log file info at the bottom
     log_path = os.path.relpath(ChessAI.log_file, os.path.dirname(os.path.abspath(__file__)))
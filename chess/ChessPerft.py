@@ -0,0 +1,120 @@
+"""
+Perft: count the positions reachable in exactly depth plies, to check the move generator against published
+numbers and to measure the throughput of getValidMoves/makeMove/undoMove.
+Run from the chess directory, e.g.
+    python ChessPerft.py --depth 3 --fen "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1"
+The engine only promotes to a queen, so positions with promotions in the tree (e.g. the standard
+"position 4") count fewer nodes than the published figures.
+"""
+import argparse
+import time
+from multiprocessing import Pool, cpu_count
+
+import ChessEngine
+import ChessBitboard
+
+KIWIPETE = "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1"
+
+# Subtree counts by (zobrist key, depth), kept for the life of a worker process when hashing is enabled
+_memo = None
+
+
+def newGameState(fen, use_bitboards=False):
+    gs = ChessBitboard.BitboardGameState() if use_bitboards else ChessEngine.GameState()
+    gs.loadFEN(fen)
+    return gs
+
+
+def perft(gs, depth, memo=None):
+    """
+    Number of leaf positions depth plies below the current position.
+    With a memo dict, subtree counts are stored by position key and reused when a transposition is reached.
+    """
+    if depth == 0:
+        return 1
+    if memo is not None:
+        key = (gs.zobrist_key, depth)
+        nodes = memo.get(key)
+        if nodes is not None:
+            return nodes
+    moves = gs.getValidMoves()
+    if depth == 1:
+        nodes = len(moves)
+    else:
+        nodes = 0
+        for move in moves:
+            gs.makeMove(move)
+            nodes += perft(gs, depth - 1, memo)
+            gs.undoMove()
+    if memo is not None:
+        memo[key] = nodes
+    return nodes
+
+
+def _initWorker(use_hash):
+    global _memo
+    _memo = {} if use_hash else None
+
+
+def _perftRootMove(args):
+    """
+    Count the subtree below one root move; runs in a worker process.
+    """
+    fen, code, depth, use_bitboards = args
+    gs = newGameState(fen, use_bitboards)
+    gs.makeMove(ChessEngine.Move.fromCode(code))
+    return perft(gs, depth - 1, _memo)
+
+
+def divide(fen, depth, workers=1, use_hash=False, use_bitboards=False):
+    """
+    Perft split by root move: a list of (move, nodes) pairs. Root moves are shared out over a pool of
+    worker processes when workers > 1.
+    """
+    gs = newGameState(fen, use_bitboards)
+    moves = gs.getValidMoves()
+    tasks = [(fen, move.code, depth, use_bitboards) for move in moves]
+    if workers > 1 and depth > 1:
+        with Pool(workers, initializer=_initWorker, initargs=(use_hash,)) as pool:
+            counts = pool.map(_perftRootMove, tasks)
+    else:
+        _initWorker(use_hash)
+        counts = [_perftRootMove(task) for task in tasks]
+    return list(zip(moves, counts))
+
+
+def moveName(move):
+    """
+    The move in coordinate notation, e.g. e2e4 or a7a8q.
+    """
+    name = move.getRankFile(move.startRow, move.startCol) + move.getRankFile(move.endRow, move.endCol)
+    return name + "q" if move.is_pawn_promotion else name
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Count move-tree leaves to check and time the move generator.")
+    parser.add_argument("--fen", default=ChessEngine.INITIAL_FEN, help="position to search (default: start position)")
+    parser.add_argument("--kiwipete", action="store_true", help="use the Kiwipete test position")
+    parser.add_argument("--depth", type=int, default=4)
+    parser.add_argument("--divide", action="store_true", help="print the node count below every root move")
+    parser.add_argument("--workers", type=int, default=cpu_count(), help="worker processes for the root moves")
+    parser.add_argument("--hash", action="store_true", help="reuse subtree counts of transposed positions")
+    parser.add_argument("--bitboards", action="store_true", help="use the bitboard game state")
+    args = parser.parse_args()
+
+    fen = KIWIPETE if args.kiwipete else args.fen
+    start_time = time.time()
+    results = divide(fen, args.depth, args.workers, args.hash, args.bitboards)
+    elapsed = time.time() - start_time
+    nodes = sum(count for _, count in results)
+    if args.divide:
+        for move, count in sorted(results, key=lambda result: moveName(result[0])):
+            print(f"{moveName(move)}: {count}")
+        print()
+    print(f"Nodes: {nodes}")
+    print(f"Time: {elapsed:.3f} s")
+    print(f"NPS: {nodes / max(elapsed, 1e-9):,.0f}")
+
+
+if __name__ == "__main__":
+    main()
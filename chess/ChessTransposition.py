@@ -0,0 +1,221 @@
+"""
+Transposition table for the negamax search.
+A fixed number of two-slot buckets indexed by the low bits of the Zobrist key. The first slot of a bucket keeps
+the deepest result (depth-preferred) and the second takes whatever doesn't go in the first (always-replace).
+Each slot stores a check word, the packed depth/bound/best move and the score in flat 8-byte arrays laid out in
+one buffer, so the memory used is set once up front by the size in megabytes and the buffer can be shared
+between processes.
+The check word is the key XORed with the other two words. Processes sharing a table write without locks, so a
+slot written by two of them at once holds a mix of both entries; its check word then matches neither key and
+the slot reads as empty.
+PawnHashTable is a smaller cache of pawn-structure evaluations, keyed on the pawns alone.
+"""
+import struct
+from multiprocessing.shared_memory import SharedMemory
+
+# Bound types: the stored score is exact, a lower bound (the search failed high) or an upper bound (failed low)
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+# Packed slot info: the best move's code in the low bits, then depth, bound and the search generation
+INFO_MOVE_MASK = (1 << 27) - 1
+INFO_DEPTH_SHIFT = 27
+INFO_BOUND_SHIFT = 33
+INFO_GENERATION_SHIFT = 35
+DEPTH_MASK = 63
+BOUND_MASK = 3
+GENERATION_MASK = 255
+
+SLOT_BYTES = 24  # check word, info and score, 8 bytes each
+SCORE_STRUCT = struct.Struct("<d")
+BITS_STRUCT = struct.Struct("<Q")
+
+
+def scoreBits(score):
+    """
+    The 8 bytes of a score as an integer, for the check word.
+    """
+    return BITS_STRUCT.unpack(SCORE_STRUCT.pack(score))[0]
+
+
+def tableBuckets(size_mb):
+    """
+    The largest power-of-two number of buckets that fits in size_mb megabytes.
+    """
+    buckets = 1
+    while buckets * 2 * 2 * SLOT_BYTES <= size_mb * 1024 * 1024:
+        buckets *= 2
+    return buckets
+
+
+class TranspositionTable:
+    def __init__(self, size_mb=16, buffer=None):
+        buckets = tableBuckets(size_mb)
+        slots = 2 * buckets
+        if buffer is None:
+            buffer = bytearray(slots * SLOT_BYTES)
+        self.view = memoryview(buffer)[:slots * SLOT_BYTES]
+        self.mask = buckets - 1
+        self.keys = self.view[:8 * slots].cast("Q")
+        self.info = self.view[8 * slots:16 * slots].cast("Q")
+        self.scores = self.view[16 * slots:].cast("d")
+        self.score_bits = self.view[16 * slots:].cast("Q")  # the same scores as integers, read once per probe
+        self.generation = 0
+        self.resetCounters()
+
+    def resetCounters(self):
+        self.probes = 0
+        self.hits = 0
+        self.collisions = 0  # probes that found the bucket holding other positions
+        self.stores = 0
+
+    def counters(self):
+        """
+        The probe counters as ai_stats entries.
+        """
+        return {
+            "tt_probes": self.probes,
+            "tt_hits": self.hits,
+            "tt_collisions": self.collisions,
+            "tt_stores": self.stores,
+        }
+
+    def clear(self):
+        self.view[:] = bytes(len(self.view))
+        self.generation = 0
+
+    def newSearch(self):
+        """
+        Start a new search generation, so results left over from earlier moves give up their depth-preferred
+        slots to the new ones.
+        """
+        self.generation = (self.generation + 1) & GENERATION_MASK
+
+    def probe(self, key):
+        """
+        The entry stored for a position as (depth, bound, score, move code), or None. A move code of 0 means
+        no best move was recorded.
+        """
+        self.probes += 1
+        keys = self.keys
+        info = self.info
+        score_bits = self.score_bits
+        slot = (key & self.mask) << 1
+        # each word is read once, so the score returned is the one the check word was tested against
+        data = info[slot]
+        bits = score_bits[slot]
+        if keys[slot] ^ data ^ bits != key:
+            slot += 1
+            data = info[slot]
+            bits = score_bits[slot]
+            if keys[slot] ^ data ^ bits != key:
+                if keys[slot] or keys[slot - 1]:
+                    self.collisions += 1
+                return None
+        self.hits += 1
+        return (data >> INFO_DEPTH_SHIFT & DEPTH_MASK, data >> INFO_BOUND_SHIFT & BOUND_MASK,
+                SCORE_STRUCT.unpack(BITS_STRUCT.pack(bits))[0], data & INFO_MOVE_MASK)
+
+    def store(self, key, depth, bound, score, move_code=0):
+        """
+        Record a search result. It takes the depth-preferred slot if that holds the same position, a result
+        from a shallower search or one from an earlier generation, and the always-replace slot otherwise.
+        """
+        self.stores += 1
+        keys = self.keys
+        info = self.info
+        score_bits = self.score_bits
+        slot = (key & self.mask) << 1
+        kept = info[slot]
+        if (keys[slot] ^ kept ^ score_bits[slot] != key and kept >> INFO_DEPTH_SHIFT & DEPTH_MASK > depth
+                and kept >> INFO_GENERATION_SHIFT == self.generation):
+            slot += 1
+        data = (move_code | depth << INFO_DEPTH_SHIFT | bound << INFO_BOUND_SHIFT
+                | self.generation << INFO_GENERATION_SHIFT)
+        # the check word comes from this writer's own score, not the slot's, which another writer may have
+        # overwritten in between
+        self.scores[slot] = score
+        info[slot] = data
+        keys[slot] = key ^ data ^ scoreBits(score)
+
+    def release(self):
+        """
+        Let go of the buffer; the table can't be used afterwards.
+        """
+        for view in (self.keys, self.info, self.scores, self.score_bits, self.view):
+            view.release()
+
+
+class SharedTranspositionTable(TranspositionTable):
+    """
+    A table in multiprocessing shared memory that every search process reads and writes. The parent creates it
+    (name None) and unlinks it when done; worker processes attach to it by name.
+    """
+    def __init__(self, size_mb=16, name=None):
+        size = 2 * tableBuckets(size_mb) * SLOT_BYTES
+        if name is None:
+            self.memory = SharedMemory(create=True, size=size)
+        else:
+            self.memory = SharedMemory(name=name)
+        self.name = self.memory.name
+        super().__init__(size_mb, self.memory.buf)
+
+    def close(self):
+        self.release()
+        self.memory.close()
+
+    def unlink(self):
+        """
+        Close the table and free the shared memory once every process is done with it.
+        """
+        self.close()
+        self.memory.unlink()
+
+
+class PawnHashTable:
+    """
+    Pawn-structure evaluations by pawn key. The pawns change only on pawn moves and captures, so the same few
+    structures come up again and again across a search tree and their evaluation is worth keeping.
+    A fixed number of single-entry slots indexed by the low bits of the key; a new entry replaces the old one.
+    Each process keeps its own table, as an entry depends on nothing but the pawns it was computed for.
+    """
+    def __init__(self, entries=1 << 14):
+        size = 1
+        while size * 2 <= entries:
+            size *= 2
+        self.mask = size - 1
+        self.keys = [None] * size
+        self.values = [None] * size
+        self.resetCounters()
+
+    def resetCounters(self):
+        self.probes = 0
+        self.hits = 0
+
+    def counters(self):
+        """
+        The probe counters as ai_stats entries.
+        """
+        return {"pawn_probes": self.probes, "pawn_hits": self.hits}
+
+    def clear(self):
+        size = len(self.keys)
+        self.keys = [None] * size
+        self.values = [None] * size
+
+    def probe(self, key):
+        """
+        The value stored for a pawn key, or None.
+        """
+        self.probes += 1
+        slot = key & self.mask
+        if self.keys[slot] == key:
+            self.hits += 1
+            return self.values[slot]
+        return None
+
+    def store(self, key, value):
+        slot = key & self.mask
+        self.keys[slot] = key
+        self.values[slot] = value
@@ -0,0 +1,7 @@
+"""
+The modules import each other by plain name, as when run from the chess directory, so the tests do too.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
@@ -0,0 +1,69 @@
+"""
+The batched counts and scores agree with the game state and ChessAI one position at a time.
+"""
+import random
+
+import numpy as np
+
+import ChessAI
+import ChessBatch
+import ChessEngine
+
+TOLERANCE = 1e-6
+ENDED_FENS = [
+    "7k/6Q1/6K1/8/8/8/8/8 b - - 0 1",  # checkmate
+    "r1bqkb1r/pppp1Qpp/2n2n2/4p3/2B1P3/8/PPPP1PPP/RNB1K1NR b KQkq - 0 4",  # checkmate
+    "7k/8/4Q1K1/8/8/8/8/8 b - - 0 1",  # stalemate
+    "k7/2Q5/1K6/8/8/8/8/8 b - - 0 1",  # stalemate
+]
+
+
+def randomBatch():
+    rng = random.Random(11)
+    fens = list(ENDED_FENS)
+    gs = ChessEngine.GameState()
+    while len(fens) < 1000:
+        moves = gs.getValidMoves()
+        if not moves or len(gs.moveLog) > 150:
+            gs = ChessEngine.GameState()
+            continue
+        gs.makeMove(rng.choice(moves))
+        fens.append(gs.getFEN())
+    states = []
+    for fen in fens:
+        gs = ChessEngine.GameState()
+        gs.loadFEN(fen)
+        gs.getValidMoves()  # sets checkmate and stalemate for scoreBoard
+        states.append(gs)
+    return states, ChessBatch.encodeFENs(fens)
+
+
+def test_legal_move_counts_and_check_flags():
+    states, (pieces, white_to_move, castling, enpassant) = randomBatch()
+    counts = ChessBatch.countLegalMoves(pieces, white_to_move, castling, enpassant)
+    assert counts.tolist() == [len(gs.getValidMoves()) for gs in states]
+    checks = ChessBatch.checkFlags(pieces, white_to_move)
+    assert checks.tolist() == [gs.in_check for gs in states]
+
+
+def test_scores_match_score_board():
+    states, arrays = randomBatch()
+    scores = ChessBatch.scoreBoards(*arrays)
+    expected = np.array([ChessAI.scoreBoard(gs) for gs in states])
+    np.testing.assert_allclose(scores, expected, rtol=0, atol=TOLERANCE)
+    assert sum(gs.checkmate for gs in states) >= 2 and sum(gs.stalemate for gs in states) >= 2
+
+
+def test_children_scores_include_checkmate_and_stalemate():
+    gs = ChessEngine.GameState()
+    gs.loadFEN("7k/5Q2/6K1/8/8/8/8/8 w - - 0 1")  # Qg7 mates, Qe6 stalemates
+    moves = gs.getValidMoves()
+    expected = []
+    for move in moves:
+        gs.makeMove(move)
+        gs.getValidMoves()
+        expected.append(ChessAI.scoreBoard(gs))
+        gs.undoMove()
+    scores = ChessBatch.scoreChildren(gs, moves)
+    np.testing.assert_allclose(scores, expected, rtol=0, atol=TOLERANCE)
+    assert ChessAI.CHECKMATE in scores and ChessAI.STALEMATE in scores
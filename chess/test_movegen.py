@@ -0,0 +1,89 @@
+"""
+The staged move generators agree with the full move list on both game state backends.
+"""
+import random
+
+import pytest
+
+import ChessBitboard
+import ChessEngine
+from ChessEngine import TACTICAL_MOVE_FLAGS
+
+BACKENDS = [ChessEngine.GameState, ChessBitboard.BitboardGameState]
+
+
+def randomFENs(count, seed):
+    rng = random.Random(seed)
+    fens = []
+    gs = ChessEngine.GameState()
+    while len(fens) < count:
+        moves = gs.getValidMoves()
+        if not moves or len(gs.moveLog) > 120:
+            gs = ChessEngine.GameState()
+            continue
+        gs.makeMove(rng.choice(moves))
+        fens.append(gs.getFEN())
+    return fens
+
+
+def newGameState(game_class, fen):
+    gs = game_class()
+    gs.loadFEN(fen)
+    return gs
+
+
+def moveCodes(moves):
+    return sorted(move.code for move in moves)
+
+
+@pytest.mark.parametrize("game_class", BACKENDS)
+def test_iter_moves_match_valid_moves(game_class):
+    for fen in randomFENs(1500, seed=3):
+        expected = moveCodes(newGameState(ChessEngine.GameState, fen).getValidMoves())
+        gs = newGameState(game_class, fen)
+        assert moveCodes(gs.iterMoves()) == expected, fen
+        assert moveCodes(newGameState(game_class, fen).getValidMoves()) == expected, fen
+        tactical = expected if gs.in_check else [code for code in expected if code & TACTICAL_MOVE_FLAGS]
+        assert moveCodes(newGameState(game_class, fen).getTacticalMoves()) == tactical, fen
+
+
+@pytest.mark.parametrize("game_class", BACKENDS)
+def test_king_cannot_step_back_along_a_check(game_class):
+    gs = newGameState(game_class, "rnqk1bn1/p3p1p1/1pp2p2/2Q3P1/1PPp4/N2P1P1N/P7/R1BrKbR1 w - - 8 20")
+    assert sorted(str(move) for move in gs.iterMoves()) == ["Kf2", "Kxd1"]
+    assert sorted(str(move) for move in gs.getTacticalMoves()) == ["Kf2", "Kxd1"]
+
+
+@pytest.mark.parametrize("game_class", BACKENDS)
+def test_staged_moves_survive_searching_in_between(game_class):
+    # a search makes and takes back each move before asking for the next one
+    def perft(gs, depth):
+        if depth == 0:
+            return 1
+        nodes = 0
+        for move in gs.iterMoves():
+            gs.makeMove(move)
+            nodes += perft(gs, depth - 1)
+            gs.undoMove()
+        return nodes
+
+    gs = newGameState(game_class, "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1")
+    assert perft(gs, 3) == 97862
+
+
+def test_bitboard_pins_and_checks_match_the_mailbox():
+    for fen in randomFENs(500, seed=4):
+        mailbox = newGameState(ChessEngine.GameState, fen)
+        bitboard = newGameState(ChessBitboard.BitboardGameState, fen)
+        mailbox.getValidMoves()
+        bitboard.getValidMoves()
+        assert bitboard.in_check == mailbox.in_check, fen
+        assert bitboard.pins == mailbox.pins, fen
+        assert sorted(bitboard.checks) == sorted(mailbox.checks), fen
+
+
+@pytest.mark.parametrize("game_class", BACKENDS)
+def test_no_castling_without_the_king_and_rook_at_home(game_class):
+    gs = newGameState(game_class, "4k3/8/8/8/8/8/8/4K3 w KQ - 0 1")
+    assert not any(move.is_castle_move for move in gs.iterMoves())
+    assert gs.getFEN() == "4k3/8/8/8/8/8/8/4K3 w - - 0 1"